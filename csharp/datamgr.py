@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 from typing import Tuple
 import os.path as p
-import os, re, io
+import os, re, io, filecmp
 
 class ScriptGenerator(object):
     def __init__(self):
@@ -66,6 +66,19 @@ class ScriptGenerator(object):
         self.__buffer.seek(0)
         return self.__buffer.read()
 
+def is_same_file(source_path:str, target_path:str)->bool:
+    return p.exists(target_path) and filecmp.cmp(source_path, target_path, shallow=False)
+
+def write_script(file_path:str, content:str):
+    """unchanged script is not rewritten, otherwise unity recompiles it"""
+    if p.exists(file_path):
+        with open(file_path) as fp:
+            if fp.read() == content: return
+    temp_path = p.join(p.dirname(file_path), '.{}.tmp'.format(p.basename(file_path)))
+    with open(temp_path, 'w+') as fp:
+        fp.write(content)
+    os.replace(temp_path, file_path)
+
 def generate_protobuf_manager()->ScriptGenerator:
     gen = ScriptGenerator()
     for package_name in ('System', 'System.IO', 'System.Collections.Generic', 'UnityEngine', 'dataconfig'):
@@ -168,7 +181,12 @@ if __name__ == '__main__':
             fp.write('set -x\n')
             for file_path in data_items:
                 relative_path = p.join(sync_data_path, pattern.sub('.bytes', p.basename(file_path)))
-                fp.write('cp -fv {!r} {!r}\n'.format(file_path, p.join(sync_proj, relative_path)))
+                target_path = p.join(sync_proj, relative_path)
+                if is_same_file(file_path, target_path): continue # untouched assets are not reimported by unity
+                # copy into a hidden temp file which is ignored by unity, then rename it over the asset
+                temp_path = p.join(p.dirname(target_path), '.{}.tmp'.format(p.basename(target_path)))
+                fp.write('cp -f {!r} {!r}\n'.format(file_path, temp_path))
+                fp.write('mv -fv {!r} {!r}\n'.format(temp_path, target_path))
             fp.write('rm -f {}\n'.format(fp.name))
             fp.close()
             assert os.system('bash -xe {}'.format(fp.name)) == 0
@@ -180,5 +198,4 @@ if __name__ == '__main__':
     if sync_proj:
         script_out = p.join(sync_proj, 'Assets/Scripts')
         if not p.exists(script_out): os.makedirs(script_out)
-        with open('{}/{}.cs'.format(script_out, options.class_name), 'w+') as fp:
-            fp.write(gen.dump())
+        write_script('{}/{}.cs'.format(script_out, options.class_name), gen.dump())
@@ -1,28 +1,28 @@
 #!/usr/bin/env python3
 import os.path as p
-import dict_to_protobuf
+import sys, re, os, json
 
-if __name__ == '__main__':
-    import argparse, sys, re, os, json
+def create_argument_parser(): # type: ()->object
+    import argparse
     arguments = argparse.ArgumentParser()
     arguments.add_argument('--workspace', '-w', default=p.expanduser('~/Downloads/flatcfg'))
     arguments.add_argument('--name', '-n', required=True, help='config name without extension')
     arguments.add_argument('--protobuf', '-pb', action='store_true', help='decode protobuf serialized data')
     arguments.add_argument('--dump-defaults', '-df', action='store_true', help='dump default values for flatbuffer serialized data')
-    options = arguments.parse_args(sys.argv[1:])
-    os.chdir(options.workspace)
+    return arguments
 
+def dump_config(options):
+    os.chdir(options.workspace)
     name = re.sub(r'\.[^.]+$', '', options.name)
     if options.protobuf:
+        import dict_to_protobuf, importlib
         python_out = 'pp'
         if not p.exists(python_out): os.makedirs(python_out)
         command = 'protoc --proto_path=. --python_out={} {}.proto shared_*.proto'.format(python_out, name)
         print('+ {}'.format(command))
         assert os.system(command) == 0
         sys.path.append(p.abspath(python_out))
-        module_name = '{}_pb2'.format(name)
-        exec('import {}'.format(module_name))
-        module = locals().get(module_name)
+        module = importlib.import_module('{}_pb2'.format(name))
         cls = getattr(module, '{}_ARRAY'.format(name.upper()))
         with open('{}.ppb'.format(name), 'rb') as fp:
             root = getattr(cls, 'FromString')(fp.read())
@@ -37,3 +37,6 @@ if __name__ == '__main__':
         with open('{}.json'.format(name), 'r') as fp:
             data = json.load(fp)
             print(json.dumps(data, ensure_ascii=False, indent=4))
+
+if __name__ == '__main__':
+    dump_config(create_argument_parser().parse_args(sys.argv[1:]))
@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
-import enum, xlrd, re, io, json, os, hashlib, datetime, sys, glob
+from __future__ import annotations # annotations name lazily imported xlrd/flatbuffers/protobuf types
+import enum, re, io, json, os, hashlib, datetime, sys, glob, struct
 import os.path as p
 from typing import Dict
 import operator
-import flatbuffers
-from google.protobuf.internal.enum_type_wrapper import EnumTypeWrapper
 
 ROW_RULE_INDEX, \
 ROW_TYPE_INDEX, \
@@ -16,7 +15,24 @@ ROW_DATA_INDEX = range(6)
 SHARED_PREFIX = 'shared_'
 SHARED_ENUM_NAME = '{}enum'.format(SHARED_PREFIX)
 ROOT_CLASS_TEMPLATE = '{}_ARRAY'
+MANIFEST_NAME = 'manifest.json'
+SHARD_NAME = 'shard.json'
+ARTIFACT_INDEX_NAME = 'artifacts.json'
+ARTIFACT_INFO_NAME = 'info.json'
+ROW_CACHE_DIRNAME = 'rows'
+SHEET_CACHE_INDEX_NAME = 'book.json'
+SHEET_CACHE_MAGIC = b'FCSC'
+SHEET_CACHE_VERSION = 1
+SHEET_CACHE_HEADER = struct.Struct('=4sHc16sIII16s') # magic, version, byte order, book digest, rows, columns, strings, sheet digest
+DAEMON_SOCKET_NAME = 'flatcfg.sock'
+VERSION = '1.1.0'
 FIXED_MEMORY_NAME = 'memory'
+XL_CELL_EMPTY, XL_CELL_TEXT, XL_CELL_NUMBER, XL_CELL_DATE, XL_CELL_BOOLEAN, XL_CELL_ERROR, XL_CELL_BLANK = range(7) # same as xlrd cell types
+XLSX_NAMESPACE = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_ERROR_CODES = {'#NULL!': 0x00, '#DIV/0!': 0x07, '#VALUE!': 0x0F, '#REF!': 0x17, '#NAME?': 0x1D, '#NUM!': 0x24, '#N/A': 0x2A}
+XLSX_ROW_TAG, XLSX_CELL_TAG, XLSX_VALUE_TAG, XLSX_INLINE_TAG, XLSX_TEXT_TAG, XLSX_RUN_TAG, XLSX_PHONETIC_TAG = \
+    (XLSX_NAMESPACE + x for x in ('row', 'c', 'v', 'is', 't', 'r', 'rPh'))
+XML_SPACE_ATTRIBUTE = '{http://www.w3.org/XML/1998/namespace}space'
 
 class FieldType(enum.Enum):
     float, float32, float64, double, \
@@ -280,7 +296,7 @@ class Codec(object):
         return re.match(r'^[+-]?\d+\.\d+$', v)
 
     def is_cell_empty(self, cell:xlrd.sheet.Cell)->bool:
-        return cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK) or not str(cell.value).strip()
+        return cell.ctype in (XL_CELL_EMPTY, XL_CELL_BLANK) or not str(cell.value).strip()
 
     def parse_int(self, v:str):
         return int(re.sub(r'\.\d+$', '', v)) if v else 0
@@ -310,12 +326,30 @@ class Codec(object):
         if re.match(r'^\d{4}(-\d{1,2})+ \d{1,2}(:\d{1,2})+$', v):
             date = datetime.datetime.strptime(v, date_format) + offset
         elif self.is_float(v):
+            import xlrd
             date = xlrd.xldate_as_datetime(self.parse_float(v), self.datemode) + offset
         else:
             raise SyntaxError('invalid date format {!r}, expect date with format {!r}'.format(v, date_format))
         seconds = (date - datetime.datetime(1970, 1, 1)).total_seconds()
         return min(int(seconds), (1<<32)-1)
 
+    def parse_xldate(self, v:float)->int:
+        """same as parse_date of a date cell printed as float"""
+        import xlrd
+        date = xlrd.xldate_as_datetime(v, self.datemode) + datetime.timedelta(seconds=-self.time_zone * 3600)
+        seconds = (date - datetime.datetime(1970, 1, 1)).total_seconds()
+        return min(int(seconds), (1<<32)-1)
+
+    @staticmethod
+    def is_plain_float(v:float)->bool:
+        """float cell values printed without exponent, whose text parses back to the same values"""
+        return v == 0 or 1e-4 <= abs(v) < 1e16
+
+    @staticmethod
+    def is_plain_integer(v:float)->bool:
+        """float cell values printed as integers with a '.0' suffix"""
+        return v.is_integer() and -1e16 < v < 1e16
+
     def parse_duration(self, v:str)->int:
         components = [self.parse_int(x) for x in re.split(r'\s*[:\uff1a]\s*', v)] # type: list[int]
         assert len(components) <= 4
@@ -373,6 +407,38 @@ class Codec(object):
             if cell_value == name: column_indice.append(n)
         return column_indice
 
+__module_cache = {} # type: dict[str, tuple[str, object]]
+
+def load_module(filepath:str, module_name:str)->object:
+    """import generated module once per process, and only execute it again when its source changed"""
+    with open(filepath, 'rb') as fp:
+        source = fp.read()
+    digest = hashlib.md5(source).hexdigest()
+    cache = __module_cache.get(filepath)
+    if cache and cache[0] == digest:
+        module = cache[1]
+    else:
+        import types
+        module = types.ModuleType(module_name)
+        module.__file__ = filepath
+        sys.modules[module_name] = module
+        exec(compile(source, filepath, 'exec'), module.__dict__)
+        __module_cache[filepath] = (digest, module)
+    sys.modules[module_name] = module
+    return module
+
+class ModuleMap(dict):
+    def __init__(self, python_out:str):
+        super(ModuleMap, self).__init__()
+        self.python_out = python_out
+
+    def get(self, module_name:str, default = None)->object:
+        if module_name not in self:
+            filepath = p.join(self.python_out, '{}.py'.format(module_name))
+            if not p.exists(filepath): return default
+            self[module_name] = load_module(filepath, module_name)
+        return super(ModuleMap, self).get(module_name)
+
 class BookEncoder(Codec):
     def __init__(self, workspace:str, debug:bool):
         super(BookEncoder, self).__init__()
@@ -380,10 +446,16 @@ class BookEncoder(Codec):
         self.enum_filepath: str = None
         self.enum_filename: str = None
         self.syntax_filepath: str = None
+        self.output_filepath: str = None
+        self.row_count:int = 0
+        self.output_size:int = 0
+        self.output_writer:PipelineStage = None # writer stage of build pipeline
+        self.output_futures = [] # type: list[Future]
+        self.artifact_cache:ArtifactCache = None
         self.sheet: xlrd.sheet.Sheet = None
         self.table: TableFieldObject = None
         assert workspace
-        if not p.exists(workspace): os.makedirs(workspace)
+        if not p.exists(workspace): os.makedirs(workspace, exist_ok=True)
         self.workspace:str = workspace
         self.debug = debug
         self.sheet:xlrd.sheet.Sheet = None
@@ -394,13 +466,30 @@ class BookEncoder(Codec):
         self.fixed64_codec:FixedCodec = None
         self.signed_encoding:bool = True
         self.force_null:bool = False
+        self.schema_list:list[str] = []
+        self.enum_map:dict[str, dict[str, int]] = {}
+        self.shared_tables:list[TableFieldObject] = []
+        self.include_enum:bool = True
 
     def set_package_name(self, package_name:str):
         self.package_name = package_name
 
+    def write_file(self, filepath:str, content:str):
+        # shared schemas may be read by other processes at the same time
+        write_file(filepath, content.encode('utf-8'))
+
+    def add_schema(self, filepath:str):
+        if filepath not in self.schema_list: self.schema_list.append(filepath)
+
     def get_indent(self, depth:int)->str:
         return ' '*depth*4
 
+    @staticmethod
+    def get_enum_cases(name:str, case_map:Dict[str, int])->list[tuple[str, int]]:
+        """cases sorted by number, an enum without cases, e.g. new type in --header-only mode, gets a NONE case as both formats need one"""
+        if not case_map: return [('{}_NONE'.format(re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', name).upper()), 0)]
+        return sorted(case_map.items(), key=operator.itemgetter(1))
+
     def get_field_accessible(self, field:FieldObject)->bool:
         return self.access == FieldAccess.default \
                or field.access == FieldAccess.default \
@@ -417,6 +506,82 @@ class BookEncoder(Codec):
         if not self.get_field_accessible(array): return False
         return self.get_table_accessible(array.table)
 
+    def get_accessible_members(self, table:TableFieldObject)->list[FieldObject]:
+        """member fields written into schema of current access mode, same filtering as schema generating"""
+        member_list = []
+        for member in table.member_fields:
+            if not self.get_field_accessible(member): continue
+            if isinstance(member, TableFieldObject) and not self.get_table_accessible(member): continue
+            if isinstance(member, ArrayFieldObject) and not self.get_array_accessible(member): continue
+            member_list.append(member)
+        return member_list
+
+    def compile_value_parser(self, field:FieldObject): # type: (FieldObject)->callable
+        """pick parsing function of a scalar field once, instead of dispatching on field type for every cell"""
+        if isinstance(field, EnumFieldObject):
+            case_map = self.enum_map.get(field.enum)
+            return lambda v: case_map[v] if v else 0
+        if field.tag != FieldTag.none:
+            codec = self.fixed32_codec if field.tag == FieldTag.fixed_float32 else self.fixed64_codec
+            parse_float, signed_encoding = self.parse_float, self.signed_encoding
+            return lambda v: codec.encode(parse_float(v), signed_encoding)
+        ftype = field.type
+        if ftype == FieldType.string: return self.parse_string
+        if ftype in type_presets.ints or ftype in type_presets.uints: return self.parse_int
+        if ftype in type_presets.floats: return self.parse_float
+        if ftype == FieldType.bool: return self.parse_bool
+        if ftype == FieldType.date: return self.parse_date
+        if ftype == FieldType.duration: return self.parse_duration
+        raise SyntaxError('{} not a scalar field'.format(field))
+
+    def compile_cell_parser(self, field:FieldObject): # type: (FieldObject)->callable
+        """pick parsing function of raw cell values of a scalar field, number and bool cells are converted by field type
+        without printing and parsing them again, results are the same as compile_value_parser of str(v).strip()"""
+        parse = self.compile_value_parser(field)
+        def parse_text(v): return parse(str(v).strip())
+        ftype, is_plain_integer = field.type, self.is_plain_integer
+        if isinstance(field, EnumFieldObject) or ftype == FieldType.duration: return parse_text
+        if ftype == FieldType.string: return lambda v: str(v).strip()
+        if field.tag != FieldTag.none:
+            codec = self.fixed32_codec if field.tag == FieldTag.fixed_float32 else self.fixed64_codec
+            signed_encoding = self.signed_encoding
+            def parse_fixed_float(v):
+                if type(v) is float or type(v) is int: return codec.encode(float(v), signed_encoding)
+                return parse_text(v)
+            return parse_fixed_float
+        if ftype in type_presets.ints or ftype in type_presets.uints:
+            def parse_int(v):
+                if type(v) is float and is_plain_integer(v): return int(v)
+                if type(v) is int: return v
+                return parse_text(v)
+            return parse_int
+        if ftype in type_presets.floats:
+            def parse_float(v):
+                if type(v) is float: return v
+                if type(v) is int: return float(v)
+                return parse_text(v)
+            return parse_float
+        if ftype == FieldType.bool:
+            def parse_bool(v):
+                if type(v) is float and is_plain_integer(v) or type(v) is int: return v != 0
+                return parse_text(v)
+            return parse_bool
+        if ftype == FieldType.date:
+            parse_xldate, is_plain_float = self.parse_xldate, self.is_plain_float
+            def parse_date(v):
+                if type(v) is float and is_plain_float(v): return parse_xldate(v)
+                return parse_text(v)
+            return parse_date
+        return parse_text
+
+    def parse_count(self, v:any, max_count:int)->int:
+        """item count of array/group field, out of range values means no items"""
+        if type(v) is float and self.is_plain_integer(v): count = int(v)
+        else:
+            if not str(v).strip(): return 0
+            count = self.parse_int(str(v))
+        return count if 0 < count <= max_count else 0
+
     def init(self, sheet:xlrd.sheet.Sheet):
         self.sheet = sheet
 
@@ -432,40 +597,101 @@ class BookEncoder(Codec):
     def save_shared_syntax(self, tables): # type: (list[TableFieldObject])->None
         pass
 
-    def compile_schemas(self) -> str:
+    def get_python_out(self)->str:
+        pass
+
+    def get_module_path(self)->str:
+        return self.get_python_out()
+
+    def get_compiler_command(self, python_out:str, schema_list): # type: (str, list[str])->list[str]
+        pass
+
+    def write_output(self, output_filepath:str, data:bytes, verify = None): # type: (str, bytes, callable)->None
+        """write binary output, or hand it over to writer stage of build pipeline"""
+        if self.output_writer:
+            self.output_futures.append(self.output_writer.submit(write_file, output_filepath, data, verify))
+        else: write_file(output_filepath, data, verify)
+
+    def run_compiler(self, python_out:str, schema_list): # type: (str, list[str])->None
+        import subprocess
+        process = subprocess.run(self.get_compiler_command(python_out, schema_list), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        print(process.stdout.decode('utf-8', errors='replace'), end='') # follows redirected stdout
+        assert process.returncode == 0
+
+    def compile_schemas(self, schema_list = None)->str: # type: (list[str])->str
+        """compile schemas whose content or included schemas changed since last compiling with one compiler call"""
+        python_out, compile_list, save_index = self.check_schemas(schema_list)
+        if compile_list:
+            self.run_compiler(python_out, compile_list)
+            save_index()
+        return python_out
+
+    def check_schemas(self, schema_list = None): # type: (list[str])->tuple[str, list[str], callable]
+        """find schemas to compile, the returned function records them as compiled after the compiler succeeded"""
+        if schema_list is None: schema_list = self.schema_list
+        python_out = self.get_python_out()
+        if not p.exists(python_out): os.makedirs(python_out)
+        index_filepath = p.join(python_out, 'schemas.json')
+        index:dict[str, str] = {}
+        if p.exists(index_filepath):
+            with open(index_filepath) as fp: index = json.load(fp)
+        digest_map:dict[str, str] = {}
+        compile_list:list[str] = []
+        for filepath in schema_list:
+            md5 = hashlib.md5()
+            with open(filepath, 'rb') as fp: source = fp.read()
+            md5.update(source)
+            for include in re.findall(r'^(?:include|import) "([^"]+)";', source.decode('utf-8'), re.MULTILINE):
+                with open(p.join(p.dirname(filepath), include), 'rb') as fp: md5.update(fp.read())
+            name = p.basename(filepath)
+            digest_map[name] = md5.hexdigest()
+            if index.get(name) != digest_map[name]: compile_list.append(filepath)
+        restored = False
+        if self.artifact_cache and compile_list: # modules compiled by other builds are restored instead of running compiler
+            cache_list = [x for x in compile_list if self.artifact_cache.load('modules', self.get_module_key(digest_map[p.basename(x)]), python_out) is not None]
+            compile_list = [x for x in compile_list if x not in cache_list]
+            restored = bool(cache_list)
+        def save_index():
+            if self.artifact_cache:
+                for filepath in compile_list:
+                    self.artifact_cache.save('modules', self.get_module_key(digest_map[p.basename(filepath)]), self.get_module_files(filepath), python_out)
+            index.update(digest_map)
+            write_file(index_filepath, json.dumps(index, indent=4, sort_keys=True).encode('utf-8'))
+        if restored and not compile_list: save_index()
+        return python_out, compile_list, save_index
+
+    def get_module_key(self, schema_digest:str)->str:
+        return hashlib.md5('{}:{}:{}'.format(VERSION, self.__class__.__name__, schema_digest).encode('utf-8')).hexdigest()
+
+    def get_module_files(self, schema_filepath:str)->list[str]:
+        """python modules generated from a schema by compiler"""
         pass
 
     def load_modules(self):
-        import importlib
-        python_out = self.compile_schemas()
-        module_list = []
-        for base_path, _, file_name_list in os.walk(python_out):
-            sys.path.append(base_path)
-            for file_name in file_name_list:
-                if not file_name.endswith('.py') or file_name.startswith('__'): continue
-                module_name = re.sub(r'\.py$', '', file_name)
-                exec('import {}'.format(module_name))
-                module_list.append(module_name)
-        module_map = {}
-        scope_envs = locals()
-        for module_name in module_list:
-            module_map[module_name] = scope_envs.get(module_name)
-            importlib.reload(scope_envs.get(module_name))
-        self.module_map = module_map
-        return module_map
+        python_out = self.get_python_out()
+        if python_out not in sys.path: sys.path.insert(0, python_out) # generated modules import each other
+        self.module_map = ModuleMap(self.get_module_path())
+        return self.module_map
 
 class ProtobufEncoder(BookEncoder):
     def __init__(self, workspace:str, debug:bool):
         super(ProtobufEncoder, self).__init__(workspace, debug)
         self.enum_filename = '{}.proto'.format(SHARED_ENUM_NAME)
         self.include_protos = []
+        self.use_descriptor_pool:bool = False # build message classes in process instead of running protoc
+        self.use_wire_format:bool = False # write rows in wire format directly instead of building message objects
+        self.use_streaming:bool = False # encode and write rows one by one instead of holding the whole root message
+        self.row_jobs:int = 1 # processes for encoding row chunks of a sheet
+        self.chunk_rows:int = 10000
+        self.__row_encoder = None # type: callable
+        self.use_row_cache:bool = False # reuse encoded messages of unchanged rows from last build
+        self.row_cache:RowCache = None
 
     def __generate_enums(self, enum_map:Dict[str, Dict[str, int]], buffer:io.StringIO = None)->str:
         if not buffer: buffer = io.StringIO()
         indent = self.get_indent(1)
         for name, field in enum_map.items():
-            field_cases = [x for x in field.items()]
-            field_cases.sort(key=operator.itemgetter(1))
+            field_cases = self.get_enum_cases(name, field)
             buffer.write('enum {}\n'.format(name))
             buffer.write('{\n')
             for case, index in field_cases:
@@ -532,16 +758,125 @@ class ProtobufEncoder(BookEncoder):
             buffer.write('{}{} {} items = 1;\n'.format(indent, FieldRule.repeated.name, table.type_name))
             buffer.write('}\n')
 
-    def compile_schemas(self)->str:
-        python_out = p.abspath('{}/pp'.format(self.workspace))
-        shared_schema = [f for f in glob.glob('{}/{}*.proto'.format(self.workspace, SHARED_PREFIX))]
-        data_schema = '{}/{}.proto'.format(self.workspace, self.sheet.name.lower())
-        import shutil
-        if p.exists(python_out): shutil.rmtree(python_out)
-        os.makedirs(python_out)
-        command = 'protoc --proto_path={} --python_out={} {} {}'.format(self.workspace, python_out, " ".join(shared_schema), data_schema)
-        assert os.system(command) == 0
-        return python_out
+    def __get_type_path(self, name:str)->str:
+        return '.{}.{}'.format(self.package_name, name) if self.package_name else '.{}'.format(name)
+
+    def __get_scalar_type(self, t:FieldType)->int:
+        from google.protobuf.descriptor_pb2 import FieldDescriptorProto
+        if t in (FieldType.date, FieldType.duration): t = FieldType.uint32
+        name = 'TYPE_{}'.format(t.name.upper())
+        if t in type_presets.nests or not hasattr(FieldDescriptorProto, name):
+            raise SyntaxError('{!r} is not a protobuf scalar type'.format(t.name))
+        return getattr(FieldDescriptorProto, name)
+
+    def __generate_descriptor(self, table:TableFieldObject, file_proto, visit_map = None, ignore_tags:bool = True):
+        from google.protobuf.descriptor_pb2 import FieldDescriptorProto
+        if not visit_map: visit_map:dict[str, bool] = {}
+        if visit_map.get(table.type_name): return
+        if ignore_tags and table.tag != FieldTag.none: return
+        visit_map[table.type_name] = True
+        nest_table_list:list[TableFieldObject] = []
+        message = file_proto.message_type.add(name=table.type_name)
+        field_number = 0
+        for member in table.member_fields:
+            if not self.get_field_accessible(member): continue
+            field_number += 1
+            assert member.rule, member
+            field = FieldDescriptorProto(name=member.name, number=field_number)
+            field.label = getattr(FieldDescriptorProto, 'LABEL_{}'.format(member.rule.name.upper()))
+            if isinstance(member, TableFieldObject):
+                if not self.get_table_accessible(member): continue
+                nest_table_list.append(member)
+                field.type, field.type_name = FieldDescriptorProto.TYPE_MESSAGE, self.__get_type_path(member.type_name)
+            elif isinstance(member, ArrayFieldObject):
+                if not self.get_array_accessible(member): continue
+                nest_table_list.append(member.table)
+                field.type, field.type_name = FieldDescriptorProto.TYPE_MESSAGE, self.__get_type_path(member.table.type_name)
+            elif isinstance(member, EnumFieldObject):
+                field.type, field.type_name = FieldDescriptorProto.TYPE_ENUM, self.__get_type_path(member.enum)
+            elif isinstance(member, GroupFieldObject):
+                if isinstance(member.field, TableFieldObject):
+                    field.type, field.type_name = FieldDescriptorProto.TYPE_MESSAGE, self.__get_type_path(member.field.type_name)
+                else:
+                    field.type = self.__get_scalar_type(member.type)
+            else:
+                field.type = self.__get_scalar_type(member.type)
+            if member.name.lower() == 'id': pass
+            elif member.type not in (FieldType.table, FieldType.array) and member.rule != FieldRule.repeated:
+                if member.default: field.default_value = member.default
+            message.field.add().CopyFrom(field)
+        for nest_table in nest_table_list:
+            self.__generate_descriptor(nest_table, file_proto, visit_map)
+        if table.member_count == 0 and table.tag == FieldTag.none:
+            root_message = file_proto.message_type.add(name=ROOT_CLASS_TEMPLATE.format(table.type_name))
+            root_message.field.add(name='items', number=1, label=FieldDescriptorProto.LABEL_REPEATED,
+                                   type=FieldDescriptorProto.TYPE_MESSAGE, type_name=self.__get_type_path(table.type_name))
+
+    def __create_file_descriptor(self, name:str, dependencies = ()): # type: (str, tuple[str])->object
+        from google.protobuf.descriptor_pb2 import FileDescriptorProto
+        file_proto = FileDescriptorProto(name=name, syntax='proto2')
+        if self.package_name: file_proto.package = self.package_name
+        file_proto.dependency.extend(dependencies)
+        return file_proto
+
+    def build_descriptors(self): # type: ()->list[object]
+        """build descriptors of shared enums, shared tables and sheet messages from parsed table tree"""
+        enum_proto = self.__create_file_descriptor(self.enum_filename)
+        for name, field in self.enum_map.items():
+            enum_type = enum_proto.enum_type.add(name=name)
+            for case, index in sorted(field.items(), key=operator.itemgetter(1)):
+                enum_type.value.add(name=case, number=index)
+        file_protos = [enum_proto]
+        for table in self.shared_tables:
+            shared_proto = self.__create_file_descriptor('{}{}.proto'.format(SHARED_PREFIX, table.type_name))
+            self.__generate_descriptor(table, shared_proto, ignore_tags=False)
+            file_protos.append(shared_proto)
+        sheet_proto = self.__create_file_descriptor('{}.proto'.format(self.table.type_name.lower()), [x.name for x in file_protos[1:]])
+        if self.include_enum: sheet_proto.dependency.insert(0, enum_proto.name)
+        self.__generate_descriptor(self.table, sheet_proto)
+        file_protos.append(sheet_proto)
+        return file_protos
+
+    def __load_descriptor_modules(self)->Dict[str, object]:
+        import types
+        from google.protobuf import descriptor_pool, message_factory
+        from google.protobuf.internal.enum_type_wrapper import EnumTypeWrapper
+        pool = descriptor_pool.DescriptorPool()
+        get_message_class = getattr(message_factory, 'GetMessageClass', None) or message_factory.MessageFactory(pool).GetPrototype
+        module_map = {}
+        for file_proto in self.build_descriptors():
+            descriptor = pool.Add(file_proto)
+            if not hasattr(descriptor, 'message_types_by_name'): descriptor = pool.FindFileByName(file_proto.name)
+            module = types.SimpleNamespace()
+            for name, enum_type in descriptor.enum_types_by_name.items():
+                setattr(module, name, EnumTypeWrapper(enum_type))
+            for name, message_type in descriptor.message_types_by_name.items():
+                setattr(module, name, get_message_class(message_type))
+            module_map['{}_pb2'.format(re.sub(r'\.proto$', '', file_proto.name))] = module
+        return module_map
+
+    def get_python_out(self)->str:
+        return p.abspath('{}/pp'.format(self.workspace))
+
+    def check_schemas(self, schema_list = None): # type: (list[str])->tuple[str, list[str], callable]
+        if self.use_descriptor_pool or self.use_wire_format: return self.get_python_out(), [], None
+        return super(ProtobufEncoder, self).check_schemas(schema_list)
+
+    def get_module_files(self, schema_filepath:str)->list[str]:
+        return [p.join(self.get_python_out(), re.sub(r'\.proto$', '_pb2.py', p.basename(schema_filepath)))]
+
+    def get_compiler_command(self, python_out:str, schema_list): # type: (str, list[str])->list[str]
+        return ['protoc', '--proto_path={}'.format(self.workspace), '--python_out={}'.format(python_out)] + schema_list
+
+    def load_modules(self):
+        if self.use_descriptor_pool:
+            self.module_map = self.__load_descriptor_modules()
+            return self.module_map
+        super(ProtobufEncoder, self).load_modules()
+        python_out = self.get_python_out()
+        for filepath in sorted(glob.glob('{}/{}*_pb2.py'.format(python_out, SHARED_PREFIX))): # imported by sheet modules
+            self.module_map.get(re.sub(r'\.py$', '', p.basename(filepath)))
+        return self.module_map
 
     def get_module(self, module_name:str)->object:
         return self.module_map.get('{}_pb2'.format(module_name))
@@ -556,178 +891,430 @@ class ProtobufEncoder(BookEncoder):
         enum_type:EnumTypeWrapper = getattr(module, field.enum)
         return enum_type.Value(case_name)
 
-    def __encode_array(self, container, field:ArrayFieldObject):
-        item_count = 0 # field.count
-        cell = self.sheet.cell(self.cursor, field.offset)
-        if not self.is_cell_empty(cell):
-            count = self.parse_int(str(cell.value))
-            if 0 < count <= field.count: item_count = count
-        for n in range(item_count):
-            message = container.add() # type: object
-            self.__encode_table(field.elements[n], message)
-
-    def __encode_fixed_floats(self, container, memories):
-        for m in memories:
-            ff = container.add() # type: object
-            ff.__setattr__(FIXED_MEMORY_NAME, m)
-
-    def __encode_group(self, group:GroupFieldObject, container):
-        item_count = 0  # field.count
-        cell = self.sheet.cell(self.cursor, group.offset)
-        if not self.is_cell_empty(cell):
-            count = self.parse_int(str(cell.value))
-            if 0 < count <= group.count: item_count = count
-        for n in range(item_count):
-            field = group.items[n]
-            v = str(self.sheet.cell(self.cursor, field.offset).value).strip()
-            if isinstance(group.field, EnumFieldObject):
-                container.append(self.parse_enum(v, group.field))
-            elif group.field.tag == FieldTag.fixed_float32:
-                assert isinstance(group.field, TableFieldObject)
-                ff = container.add() # type: object
-                ff.__setattr__(FIXED_MEMORY_NAME, self.fixed32_codec.encode(self.parse_float(v), self.signed_encoding))
-            elif group.field.tag == FieldTag.fixed_float64:
-                assert isinstance(group.field, TableFieldObject)
-                ff = container.add()  # type: object
-                ff.__setattr__(FIXED_MEMORY_NAME, self.fixed64_codec.encode(self.parse_float(v), self.signed_encoding))
-            elif group.type == FieldType.string:
-                if not self.force_null or v: container.append(self.parse_string(v))
-            else:
-                container.append(self.parse_scalar(v, field.type))
-
-    def __encode_table(self, table:TableFieldObject, message:object = None):
-        if not message: message = self.create_message_object(table.type_name)
-        for field in table.member_fields:
-            fv = str(self.sheet.cell(self.cursor, field.offset).value).strip()
-            nest_object = message.__getattribute__(field.name)
-            if isinstance(field, TableFieldObject) and field.rule != FieldRule.repeated:
-                self.__encode_table(field, message=nest_object)
-                continue
-            elif isinstance(field, ArrayFieldObject):
-                self.__encode_array(container=nest_object, field=field)
-                continue
-            elif field.rule == FieldRule.repeated:
-                items = self.parse_array(fv)
-                if isinstance(field, GroupFieldObject):
-                    self.__encode_group(field, nest_object)
-                    continue
-                elif isinstance(field, EnumFieldObject):
-                    items = [self.parse_enum(x, field) for x in items]
-                elif field.tag == FieldTag.fixed_float32:
-                    items = [self.fixed32_codec.encode(self.parse_float(x), self.signed_encoding) for x in items]
-                    self.__encode_fixed_floats(nest_object, items)
-                    continue
-                elif field.tag == FieldTag.fixed_float64:
-                    items = [self.fixed64_codec.encode(self.parse_float(x), self.signed_encoding) for x in items]
-                    self.__encode_fixed_floats(nest_object, items)
-                    continue
-                elif field.type != FieldType.string:
-                    items = [self.parse_scalar(x, field.type) for x in items]
-                else:
-                    fv = self.parse_string(fv)
-                    if self.force_null and not fv: continue
-                container = nest_object # type: list
-                for x in items: container.append(x)
-                continue
-            elif isinstance(field, EnumFieldObject):
-                fv = self.parse_enum(fv, field)
-            elif field.tag == FieldTag.fixed_float32:
-                fv = self.fixed32_codec.encode(self.parse_float(fv), self.signed_encoding)
-            elif field.tag == FieldTag.fixed_float64:
-                fv = self.fixed64_codec.encode(self.parse_float(fv), self.signed_encoding)
-            elif field.type != FieldType.string:
-                fv = self.parse_scalar(fv, field.type)
-            else:
-                fv = self.parse_string(fv)
-                if self.force_null and not fv: continue
-            message.__setattr__(field.name, fv)
-        return message
+    def __compile_fixed_floats(self, field): # type: (FieldObject)->callable
+        parse = self.compile_cell_parser(field)
+        memory_name = field.member_fields[0].name
+        def encode_fixed_floats(container, values):
+            for v in values: setattr(container.add(), memory_name, parse(v))
+        return encode_fixed_floats
+
+    def __compile_field(self, field): # type: (FieldObject)->callable
+        name, column = field.name, field.offset
+        if isinstance(field, TableFieldObject) and field.rule != FieldRule.repeated:
+            operations = self.__compile_table(field)
+            def encode_table(row, message):
+                nest_object = getattr(message, name)
+                for operation in operations: operation(row, nest_object)
+            return encode_table
+        elif isinstance(field, ArrayFieldObject):
+            element_operations = [self.__compile_table(x) for x in field.elements]
+            def encode_array(row, message):
+                container = getattr(message, name)
+                for n in range(self.parse_count(row[column], field.count)):
+                    element = container.add()
+                    for operation in element_operations[n]: operation(row, element)
+            return encode_array
+        elif isinstance(field, GroupFieldObject):
+            columns = [x.offset for x in field.items]
+            if field.field.tag != FieldTag.none:
+                encode_fixed_floats = self.__compile_fixed_floats(field.field)
+                def encode_group(row, message):
+                    count = self.parse_count(row[column], field.count)
+                    encode_fixed_floats(getattr(message, name), [row[c] for c in columns[:count]])
+                return encode_group
+            skip_empty = self.force_null and field.type == FieldType.string
+            parse = self.compile_cell_parser(field.field)
+            def encode_group(row, message):
+                container = getattr(message, name)
+                for c in columns[:self.parse_count(row[column], field.count)]:
+                    v = parse(row[c])
+                    if skip_empty and not v: continue
+                    container.append(v)
+            return encode_group
+        elif field.rule == FieldRule.repeated:
+            parse_array = self.parse_array
+            if field.tag != FieldTag.none:
+                encode_fixed_floats = self.__compile_fixed_floats(field)
+                def encode_repeated(row, message):
+                    encode_fixed_floats(getattr(message, name), parse_array(str(row[column]).strip()))
+                return encode_repeated
+            skip_empty = self.force_null and field.type == FieldType.string
+            parse = self.compile_value_parser(field)
+            def encode_repeated(row, message):
+                fv = str(row[column]).strip()
+                if skip_empty and not fv: return
+                values = [parse(x) for x in parse_array(fv)]
+                if values: getattr(message, name).extend(values) # extending nested message marks it present even with no values
+            return encode_repeated
+        skip_empty = self.force_null and field.type == FieldType.string
+        parse = self.compile_cell_parser(field)
+        def encode_scalar(row, message):
+            v = parse(row[column])
+            if skip_empty and not v: return
+            setattr(message, name, v)
+        return encode_scalar
+
+    def __compile_table(self, table:TableFieldObject): # type: (TableFieldObject)->list[callable]
+        """flatten table into per-column operations(row, message), field types are dispatched once per sheet"""
+        return [self.__compile_field(x) for x in self.get_accessible_members(table)]
+
+    varint_ranges = {
+        FieldType.int32: (-(1 << 31), (1 << 31) - 1), FieldType.int64: (-(1 << 63), (1 << 63) - 1),
+        FieldType.uint32: (0, (1 << 32) - 1), FieldType.uint64: (0, (1 << 64) - 1),
+        FieldType.enum: (-(1 << 31), (1 << 31) - 1),
+    } # type: dict[FieldType, tuple[int, int]]
+
+    varint_bytes = tuple(bytes((x,)) for x in range(0x80))
+
+    @staticmethod
+    def encode_varint(v:int)->bytes:
+        if 0 <= v < 0x80: return ProtobufEncoder.varint_bytes[v]
+        if v < 0: v += 1 << 64 # negative int32/int64 values are sign extended to 10 bytes
+        elif v < 0x4000: return bytes((0x80 | (v & 0x7F), v >> 7))
+        buffer = bytearray()
+        while v > 0x7F:
+            buffer.append(0x80 | (v & 0x7F))
+            v >>= 7
+        buffer.append(v)
+        return bytes(buffer)
+
+    def __get_field_numbers(self, table:TableFieldObject): # type: (TableFieldObject)->list[tuple[FieldObject, int]]
+        """fields written into schema with their field numbers, same numbering as __generate_syntax"""
+        field_numbers = []
+        field_number = 0
+        for member in table.member_fields:
+            if not self.get_field_accessible(member): continue
+            field_number += 1
+            if isinstance(member, TableFieldObject) and not self.get_table_accessible(member): continue
+            if isinstance(member, ArrayFieldObject) and not self.get_array_accessible(member): continue
+            field_numbers.append((member, field_number))
+        return field_numbers
+
+    def __compile_wire_writer(self, field:FieldObject, number:int)->callable:
+        """function(buffer, v) appends a tagged scalar value in proto2 wire format"""
+        encode_varint = self.encode_varint
+        ftype = FieldType.uint32 if field.type in (FieldType.date, FieldType.duration) else field.type
+        if ftype == FieldType.string:
+            tag = encode_varint(number << 3 | 2)
+            def write_string(buffer, v):
+                data = v.encode('utf-8')
+                buffer += tag
+                buffer += encode_varint(len(data))
+                buffer += data
+            return write_string
+        if ftype in (FieldType.float, FieldType.double):
+            tag, packer = (encode_varint(number << 3 | 5), struct.Struct('<f')) if ftype == FieldType.float else (encode_varint(number << 3 | 1), struct.Struct('<d'))
+            def write_fixed(buffer, v):
+                buffer += tag
+                buffer += packer.pack(v)
+            return write_fixed
+        tag = encode_varint(number << 3)
+        if ftype == FieldType.bool:
+            def write_bool(buffer, v):
+                buffer += tag
+                buffer.append(1 if v else 0)
+            return write_bool
+        if ftype not in self.varint_ranges: raise SyntaxError('{!r} is not a protobuf scalar type'.format(ftype.name))
+        min_value, max_value = self.varint_ranges.get(ftype)
+        def write_varint(buffer, v):
+            buffer += tag
+            if 0 <= v < 0x80: buffer.append(v)
+            elif min_value <= v <= max_value: buffer += encode_varint(v)
+            else: raise ValueError('Value out of range: {}'.format(v))
+        return write_varint
+
+    def __compile_wire_fixed_floats(self, table:TableFieldObject, number:int)->callable:
+        parse = self.compile_cell_parser(table)
+        write_memory = self.__compile_wire_writer(table.member_fields[0], 1)
+        encode_varint, tag = self.encode_varint, self.encode_varint(number << 3 | 2)
+        def encode_fixed_floats(buffer, values):
+            for v in values:
+                message = bytearray()
+                write_memory(message, parse(v))
+                buffer += tag
+                buffer += encode_varint(len(message))
+                buffer += message
+        return encode_fixed_floats
+
+    def __compile_wire_field(self, field:FieldObject, number:int)->callable:
+        column = field.offset
+        encode_varint, tag = self.encode_varint, self.encode_varint(number << 3 | 2)
+        if isinstance(field, TableFieldObject) and field.rule != FieldRule.repeated:
+            operations = self.__compile_wire_table(field)
+            def encode_table(row, buffer):
+                message = bytearray()
+                for operation in operations: operation(row, message)
+                if not message: return # nested message is present only if any of its fields has been set
+                buffer += tag
+                buffer += encode_varint(len(message))
+                buffer += message
+            return encode_table
+        elif isinstance(field, ArrayFieldObject):
+            element_operations = [self.__compile_wire_table(x) for x in field.elements]
+            def encode_array(row, buffer):
+                for n in range(self.parse_count(row[column], field.count)):
+                    message = bytearray()
+                    for operation in element_operations[n]: operation(row, message)
+                    buffer += tag
+                    buffer += encode_varint(len(message))
+                    buffer += message
+            return encode_array
+        elif isinstance(field, GroupFieldObject):
+            columns = [x.offset for x in field.items]
+            if field.field.tag != FieldTag.none:
+                encode_fixed_floats = self.__compile_wire_fixed_floats(field.field, number)
+                def encode_group(row, buffer):
+                    count = self.parse_count(row[column], field.count)
+                    encode_fixed_floats(buffer, [row[c] for c in columns[:count]])
+                return encode_group
+            skip_empty = self.force_null and field.type == FieldType.string
+            parse, write = self.compile_cell_parser(field.field), self.__compile_wire_writer(field.field, number)
+            def encode_group(row, buffer):
+                for c in columns[:self.parse_count(row[column], field.count)]:
+                    v = parse(row[c])
+                    if skip_empty and not v: continue
+                    write(buffer, v)
+            return encode_group
+        elif field.rule == FieldRule.repeated:
+            parse_array = self.parse_array
+            if field.tag != FieldTag.none:
+                encode_fixed_floats = self.__compile_wire_fixed_floats(field, number)
+                def encode_repeated(row, buffer):
+                    encode_fixed_floats(buffer, parse_array(str(row[column]).strip()))
+                return encode_repeated
+            skip_empty = self.force_null and field.type == FieldType.string
+            parse, write = self.compile_value_parser(field), self.__compile_wire_writer(field, number)
+            def encode_repeated(row, buffer):
+                fv = str(row[column]).strip()
+                if skip_empty and not fv: return
+                for v in [parse(x) for x in parse_array(fv)]: write(buffer, v)
+            return encode_repeated
+        skip_empty = self.force_null and field.type == FieldType.string
+        parse, write = self.compile_cell_parser(field), self.__compile_wire_writer(field, number)
+        def encode_scalar(row, buffer):
+            v = parse(row[column])
+            if skip_empty and not v: return
+            write(buffer, v)
+        return encode_scalar
+
+    def __compile_wire_table(self, table:TableFieldObject): # type: (TableFieldObject)->list[callable]
+        """flatten table into per-column operations(row, buffer) that write proto2 wire format in field number order"""
+        return [self.__compile_wire_field(x, n) for x, n in self.__get_field_numbers(table)]
+
+    def compile_sort_key(self): # type: ()->callable
+        """function(row values)->id value that rows are sorted by, None if table has no id field"""
+        for field, _ in self.__get_field_numbers(self.table):
+            if field.name != 'id': continue
+            parse_id, id_column = self.compile_cell_parser(field), field.offset
+            return lambda row: parse_id(row[id_column])
+        return None
+
+    def compile_row_encoder(self)->callable:
+        """function(row values)->encoded row message for rows of current sheet"""
+        if self.use_wire_format:
+            operations = self.__compile_wire_table(self.table)
+            def encode_row(row):
+                message = bytearray()
+                for operation in operations: operation(row, message)
+                return bytes(message)
+            return encode_row
+        self.load_modules()
+        message_class = getattr(self.get_module(self.table.type_name.lower()), self.table.type_name)
+        operations = self.__compile_table(self.table)
+        def encode_message(row):
+            message = message_class()
+            for operation in operations: operation(row, message)
+            return message.SerializeToString()
+        return encode_message
+
+    def get_row_indice(self): # type: ()->list[int]
+        """data rows in output order, sorted by id up front so that rows can be encoded one by one"""
+        row_indice = [r for r in range(ROW_DATA_INDEX, self.sheet.nrows) if str(self.sheet.cell_value(r, 0)).strip()]
+        sort_key = self.compile_sort_key()
+        if sort_key:
+            key_map = {r:sort_key(self.sheet.row_values(r)) for r in row_indice}
+            row_indice.sort(key=key_map.get) # stable as sorting repeated items
+        return row_indice
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(sheet=None, module_map={}, row_cache=None, output_writer=None, output_futures=[]) # chunk workers get row values and rebuild modules by themselves
+        state['_ProtobufEncoder__row_encoder'] = None
+        return state
+
+    def encode_rows(self, rows): # type: (list[list[any]])->list[bytes]
+        """encode rows into row messages"""
+        if not self.__row_encoder: self.__row_encoder = self.compile_row_encoder()
+        encode_row = self.__row_encoder
+        return [encode_row(x) for x in rows]
+
+    def get_schema_digest(self)->str:
+        """digest of everything besides row cells that encoded row messages depend on"""
+        import pickle
+        md5 = hashlib.md5()
+        md5.update(pickle.dumps((VERSION, self.table, self.enum_map, self.access.name, self.force_null, self.signed_encoding,
+                                 self.fixed32_codec, self.fixed64_codec, self.time_zone, self.datemode)))
+        return md5.hexdigest()
+
+    def __merge_chunk(self, digests, cached, encoded): # type: (list[bytes], list[bytes], list[bytes])->bytes
+        messages = encoded if isinstance(encoded, list) else encoded.result()
+        if digests is not None:
+            fresh_messages = iter(messages)
+            messages = [x if x is not None else next(fresh_messages) for x in cached]
+            for digest, message in zip(digests, messages): self.row_cache.put(digest, message)
+        encode_varint, item_tag = self.encode_varint, self.encode_varint(1 << 3 | 2) # items = 1
+        buffer = bytearray()
+        for message in messages:
+            buffer += item_tag
+            buffer += encode_varint(len(message))
+            buffer += message
+        return bytes(buffer)
+
+    def __iter_chunks(self, row_indice): # type: (list[int])->bytes
+        """item records of each chunk in output order, rows found in row cache are not encoded again"""
+        import collections
+        executor = None
+        if self.row_jobs > 1 and len(row_indice) > self.chunk_rows:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=self.row_jobs)
+        pending = collections.deque()
+        try:
+            for n in range(0, len(row_indice), self.chunk_rows):
+                rows = [self.sheet.row_values(r) for r in row_indice[n:n + self.chunk_rows]]
+                digests, cached = None, None
+                if self.row_cache:
+                    digests = [self.row_cache.get_digest(x) for x in rows]
+                    cached = [self.row_cache.get(x) for x in digests]
+                    rows = [x for x, message in zip(rows, cached) if message is None]
+                encoded = executor.submit(encode_chunk, self, rows) if executor and rows else self.encode_rows(rows)
+                pending.append((digests, cached, encoded))
+                while len(pending) >= (self.row_jobs * 2 if executor else 1): # bound chunks in flight
+                    yield self.__merge_chunk(*pending.popleft())
+            while pending: yield self.__merge_chunk(*pending.popleft())
+        finally:
+            if executor: executor.shutdown()
+
+    def __encode_stream(self):
+        output_filepath = self.output_filepath = p.join(self.workspace, '{}.ppb'.format(self.sheet.name.lower()))
+        temp_filepath = '{}.{}.tmp'.format(output_filepath, os.getpid())
+        if self.use_row_cache:
+            cache_filepath = p.join(self.workspace, ROW_CACHE_DIRNAME, '{}.cache'.format(self.sheet.name.lower()))
+            self.row_cache = RowCache(cache_filepath, self.get_schema_digest())
+        row_indice = self.get_row_indice()
+        try:
+            with open(temp_filepath, 'wb') as fp:
+                for chunk in self.__iter_chunks(row_indice): fp.write(chunk)
+                size = fp.tell()
+            replace_file(temp_filepath, output_filepath)
+        finally:
+            if p.exists(temp_filepath): os.remove(temp_filepath)
+        self.row_count, self.output_size = len(row_indice), size
+        if self.row_cache:
+            self.row_cache.save()
+            print('[+] reuse {}/{} cached rows'.format(self.row_cache.hit_count, len(row_indice)))
+        print('[+] size:{:,} count:{} {!r}\n'.format(size, len(row_indice), output_filepath))
 
     def encode(self):
+        if self.use_streaming or self.use_wire_format or self.use_row_cache or self.row_jobs > 1: return self.__encode_stream()
         self.load_modules()
         root_message = self.create_message_object(ROOT_CLASS_TEMPLATE.format(self.sheet.name))
         items = root_message.__getattribute__('items')
+        operations = self.__compile_table(self.table)
         for r in range(ROW_DATA_INDEX, self.sheet.nrows):
             self.cursor = r
-            if self.is_cell_empty(self.sheet.cell(r, 0)): continue
-            self.__encode_table(self.table, message=items.add())
-        output_filepath = p.join(self.workspace, '{}.ppb'.format(self.sheet.name.lower()))
+            row = self.sheet.row_values(r)
+            if not str(row[0]).strip(): continue
+            message = items.add()
+            for operation in operations: operation(row, message)
+        output_filepath = self.output_filepath = p.join(self.workspace, '{}.ppb'.format(self.sheet.name.lower()))
         from operator import attrgetter
         if len(items) and hasattr(items[0], 'id'):
             items.sort(key=attrgetter('id'))
-        with open(output_filepath, 'wb') as fp:
-            fp.write(root_message.SerializeToString())
-            print('[+] size:{:,} count:{} {!r}\n'.format(fp.tell(), len(items), output_filepath))
+        data = root_message.SerializeToString()
+        self.row_count, self.output_size = len(items), len(data)
+        self.write_output(output_filepath, data)
+        print('[+] size:{:,} count:{} {!r}\n'.format(len(data), len(items), output_filepath))
 
     def save_enums(self, enum_map:Dict[str,Dict[str,int]]):
         self.enum_filepath = p.join(self.workspace, self.enum_filename)
-        with open(self.enum_filepath, 'w+') as fp:
-            fp.write('syntax = "proto2";\n')
-            if self.package_name:
-                fp.write('package {};\n\n'.format(self.package_name))
-            fp.write(self.__generate_enums(enum_map))
-            if self.debug:
-                fp.seek(0)
-                print('+ {}'.format(self.enum_filepath))
-                # print(fp.read())
+        buffer = io.StringIO()
+        buffer.write('syntax = "proto2";\n')
+        if self.package_name:
+            buffer.write('package {};\n\n'.format(self.package_name))
+        buffer.write(self.__generate_enums(enum_map))
+        self.write_file(self.enum_filepath, buffer.getvalue())
+        self.add_schema(self.enum_filepath)
+        if self.debug:
+            print('+ {}'.format(self.enum_filepath))
 
     def save_shared_syntax(self, tables): # type: (list[TableFieldObject])->None
         self.include_protos = []
         for x in tables:
             buffer = io.StringIO()
             self.include_protos.append('{}{}.proto'.format(SHARED_PREFIX, x.type_name))
+            buffer.write('syntax = "proto2";\n')
+            if self.package_name:
+                buffer.write('package {};\n\n'.format(self.package_name))
             self.__generate_syntax(x, buffer, ignore_tags=False)
             syntax_filepath = p.join(self.workspace, '{}{}.proto'.format(SHARED_PREFIX, x.type_name))
-            with open(syntax_filepath, 'w+') as fp:
-                buffer.seek(0)
-                fp.write('syntax = "proto2";\n')
-                if self.package_name:
-                    fp.write('package {};\n\n'.format(self.package_name))
-                fp.write(buffer.read())
-                fp.seek(0)
-                print('+ {}'.format(syntax_filepath))
-                print(fp.read())
+            self.write_file(syntax_filepath, buffer.getvalue())
+            self.add_schema(syntax_filepath)
+            print('+ {}'.format(syntax_filepath))
+            print(buffer.getvalue())
 
     def save_syntax(self, table:TableFieldObject, include_enum:bool = True):
         print('# {}'.format(self.sheet.name))
         self.table = table
         self.syntax_filepath = p.join(self.workspace, '{}.proto'.format(table.type_name.lower()))
-        with open(self.syntax_filepath, 'w+') as fp:
-            buffer = io.StringIO()
-            self.__generate_syntax(table, buffer)
-            buffer.seek(0)
-            fp.write('syntax = "proto2";\n')
-            if include_enum:
-                fp.write('import "{}.proto";\n\n'.format(SHARED_ENUM_NAME))
-            if self.include_protos:
-                for proto in self.include_protos:
-                    fp.write('import "{}";\n\n'.format(proto))
-            if self.package_name:
-                fp.write('package {};\n\n'.format(self.package_name))
-            fp.write(buffer.read())
-            fp.seek(0)
-            print('+ {}'.format(self.syntax_filepath))
-            print(fp.read())
+        buffer = io.StringIO()
+        buffer.write('syntax = "proto2";\n')
+        if include_enum:
+            buffer.write('import "{}.proto";\n\n'.format(SHARED_ENUM_NAME))
+        if self.include_protos:
+            for proto in self.include_protos:
+                buffer.write('import "{}";\n\n'.format(proto))
+        if self.package_name:
+            buffer.write('package {};\n\n'.format(self.package_name))
+        self.__generate_syntax(table, buffer)
+        self.write_file(self.syntax_filepath, buffer.getvalue())
+        self.add_schema(self.syntax_filepath)
+        print('+ {}'.format(self.syntax_filepath))
+        print(buffer.getvalue())
 
 class FlatbufEncoder(BookEncoder):
     def __init__(self, workspace:str, debug:bool):
         super(FlatbufEncoder, self).__init__(workspace, debug)
+        import flatbuffers
         self.enum_filename = '{}.fbs'.format(SHARED_ENUM_NAME)
         self.builder = flatbuffers.builder.Builder(1*1024*1024)
         self.cursor = -1
         self.string_offsets:dict[str, int] = {}
         self.include_schemas = []
+        self.use_builder_slots:bool = False # encode with vtable slots computed from parsed tables instead of flatc modules
+        self.slot_map = {} # type: dict[str, dict[str, tuple[int, object, any]]]
+        self.vector_map = {} # type: dict[str, dict[str, tuple[int, object]]]
+
+    scalar_layouts = {
+        FieldType.bool: (1, 'Bool'),
+        FieldType.byte: (1, 'Int8'), FieldType.ubyte: (1, 'Uint8'),
+        FieldType.short: (2, 'Int16'), FieldType.ushort: (2, 'Uint16'),
+        FieldType.int: (4, 'Int32'), FieldType.uint: (4, 'Uint32'),
+        FieldType.long: (8, 'Int64'), FieldType.ulong: (8, 'Uint64'),
+        FieldType.float: (4, 'Float32'), FieldType.double: (8, 'Float64'),
+        FieldType.date: (4, 'Uint32'), FieldType.duration: (4, 'Uint32'),
+    } # type: dict[FieldType, tuple[int, str]]
 
     def reset(self):
+        use_builder_slots = self.use_builder_slots
         self.__init__(self.workspace, self.debug)
+        self.use_builder_slots = use_builder_slots
 
     def __generate_enums(self, enum_map:Dict[str, Dict[str, int]], buffer:io.StringIO = None)->str:
         if not buffer: buffer = io.StringIO()
         indent = self.get_indent(1)
         for name, field in enum_map.items():
-            field_cases = [x for x in field.items()]
-            field_pointer = max([x for x in field.values()])
-            field_cases.sort(key=operator.itemgetter(1))
+            field_cases = self.get_enum_cases(name, field)
+            field_pointer = field_cases[-1][1]
             buffer.write('enum {}:{}\n'.format(name, 'ubyte' if field_pointer < 0xF0 else 'ushort'))
             buffer.write('{\n')
             for case, index in field_cases:
@@ -793,194 +1380,295 @@ class FlatbufEncoder(BookEncoder):
             buffer.write('}\n\n')
             buffer.write('root_type {};\n'.format(array_type_name))
 
-    def __encode_array(self, module_name, field): # type: (str, ArrayFieldObject)->int
-        item_offsets:list[int] = []
-        item_count = 0 # field.count
-        cell = self.sheet.cell(self.cursor, field.offset)
-        if not self.is_cell_empty(cell):
-            count = self.parse_int(str(cell.value))
-            if 0 < count <= field.count: item_count = count
-        for n in range(item_count):
-            offset = self.__encode_table(field.elements[n])
-            item_offsets.append(offset)
-        if self.force_null and not item_offsets: return 0
-        return self.__encode_vector(module_name, item_offsets, field)
+    def __get_value_layout(self, field): # type: (FieldObject)->tuple[int, str]
+        if isinstance(field, (TableFieldObject, ArrayFieldObject)) or field.type == FieldType.string:
+            return 4, 'UOffsetTRelative'
+        if isinstance(field, EnumFieldObject):
+            return (1, 'Uint8') if max(self.enum_map.get(field.enum).values(), default=0) < 0xF0 else (2, 'Uint16')
+        layout = self.scalar_layouts.get(type_presets.alias(field.type))
+        if not layout: raise SyntaxError('{} not a scalar field'.format(field))
+        return layout
+
+    def __get_slot_default(self, field): # type: (FieldObject)->any
+        if field.rule == FieldRule.repeated or field.name.lower() == 'id' or not field.default: return 0
+        if isinstance(field, EnumFieldObject): return self.enum_map.get(field.enum).get(field.default, 0)
+        if field.type in type_presets.floats: return self.parse_float(field.default)
+        if field.type == FieldType.bool: return self.parse_bool(field.default)
+        if field.type in (FieldType.table, FieldType.array, FieldType.string): return 0
+        return self.parse_int(field.default)
+
+    def __generate_layout(self, table): # type: (TableFieldObject)->None
+        """vtable slots follow the same field order as __generate_syntax, so they match what flatc assigns"""
+        if table.type_name in self.slot_map: return
+        import flatbuffers
+        builder_class = flatbuffers.builder.Builder
+        slot_layouts = self.slot_map[table.type_name] = {}
+        vector_layouts = self.vector_map[table.type_name] = {}
+        nest_table_list:list[TableFieldObject] = []
+        for member in table.member_fields:
+            if not self.get_field_accessible(member): continue
+            if isinstance(member, TableFieldObject):
+                if not self.get_table_accessible(member): continue
+                nest_table_list.append(member)
+            elif isinstance(member, ArrayFieldObject):
+                if not self.get_array_accessible(member): continue
+                nest_table_list.append(member.table)
+            elif isinstance(member, GroupFieldObject) and isinstance(member.field, TableFieldObject):
+                nest_table_list.append(member.field)
+            if member.rule == FieldRule.repeated:
+                size, name = self.__get_value_layout(member.field if isinstance(member, GroupFieldObject) else member)
+                vector_layouts[member.name] = size, getattr(builder_class, 'Prepend{}'.format(name))
+                size, name = 4, 'UOffsetTRelative'
+            else:
+                size, name = self.__get_value_layout(member)
+            slot_layouts[member.name] = len(slot_layouts), getattr(builder_class, 'Prepend{}Slot'.format(name)), self.__get_slot_default(member)
+        for nest_table in nest_table_list:
+            self.__generate_layout(nest_table)
 
-    def __encode_vector(self, module_name, items, field): # type: (str, list[str], FieldObject)->int
-        assert field.rule == FieldRule.repeated
-        item_count = len(items)
-        self.start_vector(module_name, field.name, item_count)
-        for n in range(len(items)):
-            v = items[-(n+1)]
-            self.__encode_scalar(v, field)
-        return self.end_vector(item_count)
+    def build_layouts(self):
+        import flatbuffers
+        self.slot_map, self.vector_map = {}, {}
+        self.__generate_layout(self.table)
+        module_name = ROOT_CLASS_TEMPLATE.format(self.table.type_name)
+        builder_class = flatbuffers.builder.Builder
+        self.slot_map[module_name] = {'items': (0, builder_class.PrependUOffsetTRelativeSlot, 0)}
+        self.vector_map[module_name] = {'items': (4, builder_class.PrependUOffsetTRelative)}
 
     def parse_enum(self, case_name:str, field:EnumFieldObject)->int:
+        if self.use_builder_slots: return self.enum_map.get(field.enum)[case_name] if case_name else 0
         module = self.module_map.get(field.enum) # type: object
         return getattr(getattr(module, field.enum), case_name) if case_name else 0
 
-    def __encode_scalar(self, v:any, field:FieldObject):
+    def __get_scalar_prepend(self, field:FieldObject)->callable:
+        import flatbuffers
         ftype = field.type
-        builder = self.builder
+        builder_class = flatbuffers.builder.Builder
         method_name = 'Prepend{}'.format(ftype.name.title())
         if ftype in (FieldType.table, FieldType.array, FieldType.string):
-            builder.PrependUOffsetTRelative(v) # offset
-        elif hasattr(builder, method_name):
-            builder.__getattribute__(method_name)(v)
+            return builder_class.PrependUOffsetTRelative # offset
+        elif hasattr(builder_class, method_name):
+            return getattr(builder_class, method_name)
         elif ftype == FieldType.short:
-            builder.PrependInt16(v)
+            return builder_class.PrependInt16
         elif ftype == FieldType.ushort:
-            builder.PrependUint16(v)
+            return builder_class.PrependUint16
         elif ftype == FieldType.long:
-            builder.PrependInt64(v)
+            return builder_class.PrependInt64
         elif ftype == FieldType.ulong:
-            builder.PrependUint64(v)
+            return builder_class.PrependUint64
         elif ftype == FieldType.float:
-            builder.PrependFloat32(v)
+            return builder_class.PrependFloat32
         elif ftype == FieldType.double:
-            builder.PrependFloat64(v)
-        elif ftype == FieldType.enum:
-            builder.PrependUint8(v)
-        elif ftype == FieldType.ubyte:
-            builder.PrependUint8(v)
-        elif ftype == FieldType.date:
-            builder.PrependUint32(v)
-        elif ftype == FieldType.duration:
-            builder.PrependUint32(v)
+            return builder_class.PrependFloat64
+        elif ftype in (FieldType.enum, FieldType.ubyte):
+            return builder_class.PrependUint8
+        elif ftype in (FieldType.date, FieldType.duration):
+            return builder_class.PrependUint32
         else:
-            raise SyntaxError('{!r}:{} not a scalar value {}'.format(v, ftype.name, field))
+            raise SyntaxError('{} not a scalar field'.format(field))
 
     def __encode_string(self, v:str)->int:
         v = self.parse_string(v)
-        md5 = hashlib.md5()
-        md5.update(v.encode('utf-8'))
-        uuid = md5.hexdigest()
-        if uuid in self.string_offsets:
-            return self.string_offsets[uuid]
+        if v in self.string_offsets:
+            return self.string_offsets[v]
         else:
             offset = self.builder.CreateString(v)
-            self.string_offsets[uuid] = offset
+            self.string_offsets[v] = offset
             return offset
 
-    def __encode_fixed_floats(self, table, memories): # type: (TableFieldObject, list[int])->list[int]
-        offset_list = []
-        for m in memories:
-            self.start_object(table.type_name)
-            self.add_field(table.type_name, FIXED_MEMORY_NAME, m)
-            offset = self.end_object(table.type_name)
-            offset_list.append(offset)
-        return offset_list
-
-    def __encode_group(self, group): # type: (GroupFieldObject)->list[int]
-        items = []
-        has_fixed_floats = False
-        item_count = 0  # field.count
-        cell = self.sheet.cell(self.cursor, group.offset)
-        if not self.is_cell_empty(cell):
-            count = self.parse_int(str(cell.value))
-            if 0 < count <= group.count: item_count = count
-        for n in range(item_count):
-            f = group.items[n]
-            v = str(self.sheet.cell(self.cursor, f.offset).value).strip()
-            if isinstance(group.field, EnumFieldObject):
-                items.append(self.parse_enum(v, group.field))
-            elif group.type == FieldType.string:
-                if not self.force_null or v: items.append(self.__encode_string(v))
-            elif group.field.tag == FieldTag.fixed_float32:
-                has_fixed_floats = True
-                assert isinstance(group.field, TableFieldObject)
-                items.append(self.fixed32_codec.encode(self.parse_float(v), self.signed_encoding))
-            elif group.field.tag == FieldTag.fixed_float64:
-                has_fixed_floats = True
-                assert isinstance(group.field, TableFieldObject)
-                items.append(self.fixed64_codec.encode(self.parse_float(v), self.signed_encoding))
-            else:
-                items.append(self.parse_scalar(v, f.type))
-        if has_fixed_floats:
-            items = self.__encode_fixed_floats(group.field, items)
-        return items
-
-    def __encode_table(self, table): # type: (TableFieldObject)->int
-        offset_map:dict[str, int] = {}
-        module_name = table.type_name
-        row_items = self.sheet.row(self.cursor)
-        member_count = len(table.member_fields)
-        for n in range(member_count):
-            field = table.member_fields[n]
-            fv = str(row_items[field.offset].value).strip()
-            if isinstance(field, TableFieldObject) and field.rule != FieldRule.repeated:
-                offset = self.__encode_table(field)
-            elif isinstance(field, ArrayFieldObject):
-                offset = self.__encode_array(module_name, field)
-            elif field.rule == FieldRule.repeated:
-                items = self.parse_array(fv)
-                if isinstance(field, GroupFieldObject):
-                    items = self.__encode_group(field)
+    def __compile_object(self, module_name:str): # type: (str)->tuple[callable, callable]
+        builder = self.builder
+        if self.debug:
+            return lambda: self.start_object(module_name), lambda: self.end_object(module_name)
+        if self.use_builder_slots:
+            field_count = len(self.slot_map[module_name])
+            return lambda: builder.StartObject(field_count), builder.EndObject
+        module = self.module_map.get(module_name) # type: object
+        start, end = getattr(module, '{}Start'.format(module_name)), getattr(module, '{}End'.format(module_name))
+        return lambda: start(builder), lambda: end(builder)
+
+    def __compile_adder(self, module_name:str, field_name:str)->callable:
+        builder = self.builder
+        if self.debug:
+            return lambda v: self.add_field(module_name, field_name, v)
+        if self.use_builder_slots:
+            slot, prepend, default = self.slot_map[module_name][field_name]
+            return lambda v: prepend(builder, slot, v, default)
+        add = getattr(self.module_map.get(module_name), '{}Add{}'.format(module_name, self.make_camel(field_name)))
+        return lambda v: add(builder, v)
+
+    def __compile_vector(self, module_name:str, field:FieldObject)->callable:
+        assert field.rule == FieldRule.repeated
+        builder = self.builder
+        if self.use_builder_slots:
+            size, prepend = self.vector_map[module_name][field.name]
+            start = lambda n: builder.StartVector(size, n, size)
+        else:
+            prepend = self.__get_scalar_prepend(field)
+            start_vector = getattr(self.module_map.get(module_name), '{}Start{}Vector'.format(module_name, self.make_camel(field.name)))
+            start = lambda n: start_vector(builder, n)
+        end = builder.EndVector
+        if self.debug:
+            start = lambda n: self.start_vector(module_name, field.name, n)
+            end = self.end_vector
+        def encode_vector(items):
+            item_count = len(items)
+            start(item_count)
+            for n in range(item_count): prepend(builder, items[-(n+1)])
+            return end(item_count)
+        return encode_vector
+
+    def __compile_fixed_floats(self, table:TableFieldObject)->callable:
+        parse = self.compile_cell_parser(table)
+        start, end = self.__compile_object(table.type_name)
+        add = self.__compile_adder(table.type_name, FIXED_MEMORY_NAME)
+        def encode_fixed_floats(values):
+            memories = [parse(v) for v in values]
+            offset_list = []
+            for m in memories:
+                start()
+                add(m)
+                offset_list.append(end())
+            return offset_list
+        return encode_fixed_floats
+
+    def __compile_offset(self, module_name:str, field:FieldObject)->callable:
+        """compile encoding of a field stored by offset, returns None for fields stored inline"""
+        column, force_null = field.offset, self.force_null
+        if isinstance(field, TableFieldObject) and field.rule != FieldRule.repeated:
+            return self.__compile_table(field)
+        elif isinstance(field, ArrayFieldObject):
+            element_encoders = [self.__compile_table(x) for x in field.elements]
+            encode_vector = self.__compile_vector(module_name, field)
+            def encode_array(row):
+                item_offsets = [element_encoders[n](row) for n in range(self.parse_count(row[column], field.count))]
+                if force_null and not item_offsets: return 0
+                return encode_vector(item_offsets)
+            return encode_array
+        elif field.rule == FieldRule.repeated:
+            encode_vector = self.__compile_vector(module_name, field)
+            if isinstance(field, GroupFieldObject):
+                columns = [x.offset for x in field.items]
+                if field.field.tag != FieldTag.none:
+                    encode_items = self.__compile_fixed_floats(field.field)
                 elif field.type == FieldType.string:
-                    items = [self.__encode_string(x) for x in items]
-                elif isinstance(field, EnumFieldObject):
-                    items = [self.parse_enum(x, field) for x in items]
-                elif field.tag == FieldTag.fixed_float32:
-                    assert isinstance(field, TableFieldObject)
-                    items = [self.fixed32_codec.encode(self.parse_float(x), self.signed_encoding) for x in items]
-                    items = self.__encode_fixed_floats(field, items)
-                elif field.tag == FieldTag.fixed_float64:
-                    assert isinstance(field, TableFieldObject)
-                    items = [self.fixed64_codec.encode(self.parse_float(x), self.signed_encoding) for x in items]
-                    items = self.__encode_fixed_floats(field, items)
+                    encode_string = self.__encode_string
+                    encode_items = lambda values: [encode_string(v) for v in (str(x).strip() for x in values) if not force_null or v]
                 else:
-                    items = [self.parse_scalar(x, field.type) for x in items]
-                offset = self.__encode_vector(module_name, items, field) if items or not self.force_null else 0
-            elif field.type == FieldType.string:
-                offset = self.__encode_string(fv) if fv or not self.force_null else 0
+                    parse = self.compile_cell_parser(field.field)
+                    encode_items = lambda values: [parse(v) for v in values]
+                def encode_group(row):
+                    items = encode_items([row[c] for c in columns[:self.parse_count(row[column], field.count)]])
+                    return encode_vector(items) if items or not force_null else 0
+                return encode_group
+            parse_array = self.parse_array
+            if field.type == FieldType.string:
+                encode_string = self.__encode_string
+                encode_items = lambda values: [encode_string(v) for v in values]
+            elif field.tag != FieldTag.none:
+                encode_items = self.__compile_fixed_floats(field)
             else:
-                offset = -1
-            if offset >= 0: offset_map[field.name] = offset
-        # print(offset_map)
-        self.start_object(module_name)
-        for n in range(member_count):
-            field = table.member_fields[n]
-            fv = str(row_items[field.offset].value).strip()
-            if field.name in offset_map:
-                fv = offset_map.get(field.name)
-                if fv == 0: continue
-            elif isinstance(field, EnumFieldObject):
-                fv = self.parse_enum(fv, field)
-            elif field.tag == FieldTag.fixed_float32:
-                fv = self.fixed32_codec.encode(self.parse_float(fv), self.signed_encoding)
-            elif field.tag == FieldTag.fixed_float64:
-                fv = self.fixed64_codec.encode(self.parse_float(fv), self.signed_encoding)
+                parse = self.compile_value_parser(field)
+                encode_items = lambda values: [parse(v) for v in values]
+            def encode_repeated(row):
+                items = encode_items(parse_array(str(row[column]).strip()))
+                return encode_vector(items) if items or not force_null else 0
+            return encode_repeated
+        elif field.type == FieldType.string:
+            encode_string = self.__encode_string
+            def encode_string_field(row):
+                fv = str(row[column]).strip()
+                return encode_string(fv) if fv or not force_null else 0
+            return encode_string_field
+        return None
+
+    def __compile_table(self, table:TableFieldObject)->callable:
+        """flatten table into per-column operations, field types and builder functions are resolved once per sheet"""
+        module_name = table.type_name
+        slot_layouts = self.slot_map.get(module_name) if self.use_builder_slots else None
+        offset_encoders = [] # type: list[callable]
+        field_adders = [] # type: list[tuple[int, int, callable, callable]]
+        for field in self.get_accessible_members(table):
+            if slot_layouts is not None and field.name not in slot_layouts: continue
+            add = self.__compile_adder(module_name, field.name)
+            encode_offset = self.__compile_offset(module_name, field)
+            if encode_offset:
+                field_adders.append((len(offset_encoders), field.offset, None, add))
+                offset_encoders.append(encode_offset)
             else:
-                fv = self.parse_scalar(fv, field.type)
-            self.add_field(module_name, field.name, fv)
-        return self.end_object(table.type_name)
-
-    def compile_schemas(self)->str:
-        python_out = p.abspath('{}/fp'.format(self.workspace))
-        shared_schema = [f for f in glob.glob('{}/{}*.fbs'.format(self.workspace, SHARED_PREFIX))]
-        data_schema = '{}/{}.fbs'.format(self.workspace, self.sheet.name.lower())
-        import shutil
-        if p.exists(python_out): shutil.rmtree(python_out)
-        command = 'flatc -p -o {} {} {}'.format(python_out, " ".join(shared_schema), data_schema)
-        assert os.system(command) == 0
-        return python_out
+                field_adders.append((-1, field.offset, self.compile_cell_parser(field), add))
+        start, end = self.__compile_object(module_name)
+        def encode_table(row):
+            offsets = [encode_offset(row) for encode_offset in offset_encoders]
+            start()
+            for index, column, parse, add in field_adders:
+                if index >= 0:
+                    v = offsets[index]
+                    if v == 0: continue
+                else:
+                    v = parse(row[column])
+                add(v)
+            return end()
+        return encode_table
+
+    def get_python_out(self)->str:
+        return p.abspath('{}/fp'.format(self.workspace))
+
+    def get_module_path(self)->str:
+        return p.join(self.get_python_out(), *self.package_name.split('.')) if self.package_name else self.get_python_out()
+
+    def check_schemas(self, schema_list = None): # type: (list[str])->tuple[str, list[str], callable]
+        if self.use_builder_slots: return self.get_python_out(), [], None
+        return super(FlatbufEncoder, self).check_schemas(schema_list)
+
+    def get_module_files(self, schema_filepath:str)->list[str]:
+        with open(schema_filepath) as fp: source = fp.read()
+        module_path = self.get_module_path()
+        filepath_list = [p.join(module_path, '{}.py'.format(x)) for x in re.findall(r'^(?:table|struct|enum|union)\s+(\w+)', source, re.MULTILINE)]
+        if self.package_name: # namespace packages
+            name_list = self.package_name.split('.')
+            filepath_list.extend(p.join(self.get_python_out(), *name_list[:n + 1], '__init__.py') for n in range(len(name_list)))
+        return filepath_list
+
+    def get_compiler_command(self, python_out:str, schema_list): # type: (str, list[str])->list[str]
+        return ['flatc', '-p', '-o', python_out] + schema_list
+
+    def load_modules(self):
+        if self.use_builder_slots:
+            self.build_layouts()
+            self.module_map = {}
+            return self.module_map
+        return super(FlatbufEncoder, self).load_modules()
 
     def ptr(self, v:int)->str:
         return '&{:08X}:{}'.format(v, v)
 
     def start_object(self, module_name:str):
+        if self.use_builder_slots:
+            self.log(0, '- {}Start'.format(module_name))
+            self.builder.StartObject(len(self.slot_map[module_name]))
+            return
         name = '{}Start'.format(module_name)
         self.log(0, '- {}'.format(name))
         module = self.module_map.get(module_name) # type: dict
         getattr(module, name)(self.builder)
 
     def start_vector(self, module_name:str, field_name:str, item_count:int):
+        if self.use_builder_slots:
+            self.log(0, '- {}Start{}Vector #{}'.format(module_name, self.make_camel(field_name), item_count))
+            size = self.vector_map[module_name][field_name][0]
+            self.builder.StartVector(size, item_count, size)
+            return
         name = '{}Start{}Vector'.format(module_name, self.make_camel(field_name))
         self.log(0, '- {} #{}'.format(name, item_count))
         module = self.module_map.get(module_name)  # type: dict
         getattr(module, name)(self.builder, item_count)
 
     def end_object(self, module_name:str)->int:
+        if self.use_builder_slots:
+            offset = self.builder.EndObject()
+            self.log(0, '- {}End {}\n'.format(module_name, self.ptr(offset)))
+            return offset
         name = '{}End'.format(module_name)
         module = self.module_map.get(module_name) # type: dict
         offset = getattr(module, name)(self.builder)
@@ -993,26 +1681,36 @@ class FlatbufEncoder(BookEncoder):
         return offset
 
     def add_field(self, module_name:str, field_name:str, v:any):
+        if self.use_builder_slots:
+            if self.debug: self.log(0, '- {}Add{} = {!r}'.format(module_name, self.make_camel(field_name), v))
+            slot, prepend, default = self.slot_map[module_name][field_name]
+            prepend(self.builder, slot, v, default)
+            return
         name = '{}Add{}'.format(module_name, self.make_camel(field_name))
         self.log(0, '- {} = {!r}'.format(name, v))
         module = self.module_map.get(module_name)  # type: dict
         getattr(module, name)(self.builder, v)
 
     def parse_sort_field(self, r:int, c:int):
-        v = str(self.sheet.cell(r, c).value).strip()
+        v = self.sheet.cell_value(r, c)
+        if type(v) is float and self.is_plain_integer(v): return int(v)
+        v = str(v).strip()
         return self.parse_int(v) if self.is_int(v) else v
 
     def encode(self):
+        import flatbuffers
         self.load_modules()
         self.builder = flatbuffers.builder.Builder(1*1024*1024)
         item_offsets:list[int] = []
         sort_column_indice = self.get_column_indice(self.sheet, 'id')
         sort_index = sort_column_indice[0] if sort_column_indice else 0
         sort_items = []
+        encode_table = self.__compile_table(self.table)
         for r in range(ROW_DATA_INDEX, self.sheet.nrows):
-            if self.is_cell_empty(self.sheet.cell(r, 0)): continue
+            row = self.sheet.row_values(r)
+            if not str(row[0]).strip(): continue
             self.cursor = r
-            offset = self.__encode_table(self.table)
+            offset = encode_table(row)
             sort_items.append([self.parse_sort_field(r, sort_index), offset])
             self.log(0, '{} {}'.format(self.table.type_name, self.ptr(offset)))
             item_offsets.append(offset)
@@ -1026,7 +1724,7 @@ class FlatbufEncoder(BookEncoder):
         xsheet_name = self.sheet.name  # type: str
         module_name = ROOT_CLASS_TEMPLATE.format(xsheet_name)
         self.start_vector(module_name, 'items', len(item_offsets))
-        item_count = len(item_offsets)
+        item_count = self.row_count = len(item_offsets)
         for n in range(item_count):
             offset = item_offsets[-(n+1)]
             self.builder.PrependUOffsetTRelative(offset)
@@ -1036,65 +1734,75 @@ class FlatbufEncoder(BookEncoder):
         root_table = self.end_object(module_name)
         self.builder.Finish(root_table)
         # write flatbuffer into disk
-        output_filepath = p.join(self.workspace, '{}.fpb'.format(xsheet_name.lower()))
-        with open(output_filepath, 'wb') as fp:
-            fp.write(self.builder.Output())
-        # verify
-        with open(output_filepath, 'rb') as fp:
-            buffer = bytearray(fp.read())
+        output_filepath = self.output_filepath = p.join(self.workspace, '{}.fpb'.format(xsheet_name.lower()))
+        data = self.builder.Output()
+        self.output_size = len(data)
+        self.write_output(output_filepath, data, verify=self.__compile_verifier(module_name, item_count))
+        print('[+] size={:,} count={} {!r}\n'.format(len(data), item_count, output_filepath))
+
+    def __compile_verifier(self, module_name:str, item_count:int)->callable:
+        """check item count of flatbuffer read back from disk"""
+        if self.use_builder_slots:
+            import flatbuffers
+            def get_item_count(buffer:bytearray)->int:
+                item_array = flatbuffers.table.Table(buffer, flatbuffers.encode.Get(flatbuffers.packer.uoffset, buffer, 0))
+                offset = item_array.Offset(4) # vtable entry of items
+                return item_array.VectorLen(offset) if offset else 0
+        else:
             item_array_class = getattr(self.module_map.get(module_name), module_name) # type: object
-            item_array = getattr(item_array_class, 'GetRootAs{}'.format(module_name))(buffer, 0) # type: object
-            print('[+] size={:,} count={} {!r}\n'.format(fp.tell(), getattr(item_array, 'ItemsLength')(), output_filepath))
+            get_root = getattr(item_array_class, 'GetRootAs{}'.format(module_name))
+            def get_item_count(buffer:bytearray)->int:
+                return getattr(get_root(buffer, 0), 'ItemsLength')()
+        def verify(buffer:bytearray):
+            count = get_item_count(buffer)
+            if count != item_count: raise ValueError('{} items were written but {} read back'.format(item_count, count))
+        return verify
 
     def save_enums(self, enum_map:Dict[str,Dict[str,int]]):
         self.enum_filepath = p.join(self.workspace, self.enum_filename)
-        with open(self.enum_filepath, 'w+') as fp:
-            if self.package_name:
-                fp.write('namespace {};\n\n'.format(self.package_name))
-            fp.write(self.__generate_enums(enum_map))
-            if self.debug:
-                fp.seek(0)
-                print('+ {}'.format(self.enum_filepath))
-                # print(fp.read())
+        buffer = io.StringIO()
+        if self.package_name:
+            buffer.write('namespace {};\n\n'.format(self.package_name))
+        buffer.write(self.__generate_enums(enum_map))
+        self.write_file(self.enum_filepath, buffer.getvalue())
+        self.add_schema(self.enum_filepath)
+        if self.debug:
+            print('+ {}'.format(self.enum_filepath))
 
     def save_shared_syntax(self, tables): # type: (list[TableFieldObject])->None
         self.include_schemas = []
         for x in tables:
             buffer = io.StringIO()
             self.include_schemas.append('{}{}.fbs'.format(SHARED_PREFIX, x.type_name))
+            if self.package_name:
+                buffer.write('namespace {};\n\n'.format(self.package_name))
             self.__generate_syntax(x, buffer, ignore_tags=False)
             syntax_filepath = p.join(self.workspace, '{}{}.fbs'.format(SHARED_PREFIX, x.type_name))
-            with open(syntax_filepath, 'w+') as fp:
-                buffer.seek(0)
-                if self.package_name:
-                    fp.write('namespace {};\n\n'.format(self.package_name))
-                fp.write(buffer.read())
-                fp.seek(0)
-                print('+ {}'.format(syntax_filepath))
-                print(fp.read())
+            self.write_file(syntax_filepath, buffer.getvalue())
+            self.add_schema(syntax_filepath)
+            print('+ {}'.format(syntax_filepath))
+            print(buffer.getvalue())
 
     def save_syntax(self, table:TableFieldObject, include_enum:bool = True):
         self.table = table
         print('# {}'.format(self.sheet.name))
         self.syntax_filepath = p.join(self.workspace, '{}.fbs'.format(table.type_name.lower()))
-        with open(self.syntax_filepath, 'w+') as fp:
-            buffer = io.StringIO()
-            self.__generate_syntax(table, buffer)
-            buffer.seek(0)
-            if include_enum:
-                fp.write('include "{}.fbs";\n\n'.format(SHARED_ENUM_NAME))
-            if self.include_schemas:
-                for schema in self.include_schemas:
-                    fp.write('include "{}";\n\n'.format(schema))
-            if self.package_name:
-                fp.write('namespace {};\n\n'.format(self.package_name))
-            fp.write(buffer.read())
-            fp.seek(0)
-            print('+ {}'.format(self.syntax_filepath))
-            print(fp.read())
+        buffer = io.StringIO()
+        if include_enum:
+            buffer.write('include "{}.fbs";\n\n'.format(SHARED_ENUM_NAME))
+        if self.include_schemas:
+            for schema in self.include_schemas:
+                buffer.write('include "{}";\n\n'.format(schema))
+        if self.package_name:
+            buffer.write('namespace {};\n\n'.format(self.package_name))
+        self.__generate_syntax(table, buffer)
+        self.write_file(self.syntax_filepath, buffer.getvalue())
+        self.add_schema(self.syntax_filepath)
+        print('+ {}'.format(self.syntax_filepath))
+        print(buffer.getvalue())
 
 class SheetSerializer(Codec):
-    def __init__(self, debug = True):
+    def __init__(self, debug = True, enum_map = None): # type: (bool, dict[str, dict[str, int]])->None
         super(SheetSerializer, self).__init__()
         self.__type_map:dict[str, any] = vars(FieldType)
         self.__rule_map:dict[str, any] = vars(FieldRule)
@@ -1107,9 +1815,12 @@ class SheetSerializer(Codec):
         # enum settings
         self.__enum_filepath = p.join(p.dirname(p.abspath(__file__)), '{}.json'.format(SHARED_ENUM_NAME))
         self.__enum_map: dict[str, dict[str, int]] = {}
-        if p.exists(self.__enum_filepath):
+        if enum_map is not None:
+            self.__enum_map = enum_map
+        elif p.exists(self.__enum_filepath):
             with open(self.__enum_filepath) as fp:
                 self.__enum_map: dict[str, dict[str, int]] = json.load(fp)
+        self.enum_frozen = False # enum cases have been imported before packing
         self.compatible_mode = False
         self.fixed32_codec:FixedCodec = None
         self.fixed64_codec:FixedCodec = None
@@ -1172,6 +1883,9 @@ class SheetSerializer(Codec):
     @property
     def root_table(self)->TableFieldObject:return self.__root
 
+    @property
+    def enum_map(self)->Dict[str, Dict[str, int]]: return self.__enum_map
+
     def reset(self):
         self.__init__(self.debug)
 
@@ -1265,7 +1979,7 @@ class SheetSerializer(Codec):
         type_map = self.__type_map
         rule_map = self.__rule_map
         cell_type = sheet.cell_type(ROW_RULE_INDEX, c)
-        if cell_type != xlrd.XL_CELL_TEXT: return None
+        if cell_type != XL_CELL_TEXT: return None
         field_rule = sheet.cell_value(ROW_RULE_INDEX, c).strip()  # type: str
         field_type = str(sheet.cell_value(ROW_TYPE_INDEX, c)).strip()  # type: str
         field_name = str(sheet.cell_value(ROW_NAME_INDEX, c)).strip()  # type: str
@@ -1378,38 +2092,1704 @@ class SheetSerializer(Codec):
         unique_values:list[str] = []
         for r in range(ROW_DATA_INDEX, self.__sheet.nrows):
             cell = self.__sheet.cell(r, column)
-            if cell.ctype != xlrd.XL_CELL_TEXT: continue
+            if cell.ctype != XL_CELL_TEXT: continue
             value_list = self.parse_array(str(cell.value).strip())
             for field_value in value_list:
                 if field_value not in unique_values: unique_values.append(field_value)
         return unique_values
 
-    def pack(self, encoder:BookEncoder, auto_default_case:bool):
+    def import_enums(self, auto_default_case:bool):
         for field in self.__field_map.values():
             if not isinstance(field, EnumFieldObject): continue
             field.hook_default()
             field.import_cases(self.__get_unique_values(field.offset), auto_default_case)
-        with open(self.__enum_filepath, 'w+') as fp:
-            json.dump(self.__enum_map, fp, indent=4)
-        if not encoder.get_table_accessible(self.__root): return
+
+    def save_enums(self):
+        write_file(self.__enum_filepath, json.dumps(self.__enum_map, indent=4).encode('utf-8'))
+
+    def __prepare(self, encoder:BookEncoder)->bool:
+        if not encoder.get_table_accessible(self.__root): return False
         encoder.signed_encoding = self.signed_encoding
         encoder.fixed32_codec = self.fixed32_codec
         encoder.fixed64_codec = self.fixed64_codec
         encoder.init(sheet=self.__sheet)
+        encoder.table = self.__root
+        encoder.enum_map = self.__enum_map
+        encoder.shared_tables = [x for x in self.fixed_tables if x]
+        encoder.include_enum = self.has_enum
+        return True
+
+    def pack_syntax(self, encoder:BookEncoder)->bool:
+        if not self.__prepare(encoder): return False
         encoder.save_enums(enum_map=self.__enum_map)
-        shared_tables = []
-        for x in self.fixed_tables:
-            if x: shared_tables.append(x)
-        if shared_tables: encoder.save_shared_syntax(tables=shared_tables)
+        if encoder.shared_tables: encoder.save_shared_syntax(tables=encoder.shared_tables)
         encoder.save_syntax(table=self.__root, include_enum=self.has_enum)
+        return True
+
+    def pack(self, encoder:BookEncoder, auto_default_case:bool, save_syntax:bool = True):
+        if not self.enum_frozen:
+            self.import_enums(auto_default_case)
+            self.save_enums()
+        if save_syntax:
+            if not self.pack_syntax(encoder): return
+            encoder.compile_schemas()
+        elif not self.__prepare(encoder): return
         encoder.encode()
 
-if __name__ == '__main__':
+def encode_chunk(encoder:ProtobufEncoder, rows)->bytes: # type: (ProtobufEncoder, list[list[any]])->bytes
+    return encoder.encode_rows(rows)
+
+
+class SheetCell(object):
+    """cell of sheet sources other than xlrd, same fields and repr as xlrd.sheet.Cell"""
+    __slots__ = ('ctype', 'value')
+    def __init__(self, ctype:int, value):
+        self.ctype = ctype
+        self.value = value
+
+    def __repr__(self):
+        type_name = ('empty', 'text', 'number', 'xldate', 'bool', 'error', 'blank')[self.ctype]
+        return '{}:{!r}'.format(type_name, self.value)
+
+EMPTY_CELL = SheetCell(XL_CELL_EMPTY, '')
+
+def iter_rows(sheet, start:int = 0, stop:int = None): # type: (xlrd.sheet.Sheet, int, int)->Iterator[list[xlrd.sheet.Cell]]
+    """rows of a sheet source, streaming sources read them from file without loading whole sheet into memory,
+    rows of streaming sources are not padded to sheet width"""
+    if hasattr(sheet, 'iter_rows'): return sheet.iter_rows(start, stop)
+    return (sheet.row(r) for r in range(start, sheet.nrows if stop is None else min(stop, sheet.nrows)))
+
+def cook_xlsx_text(text:str, preserve:bool)->str:
+    if not preserve: text = text.strip('\t\n \r')
+    return re.sub(r'_x[0-9A-Fa-f]{4}_', lambda x: chr(int(x.group(0)[2:6], 16)), text) if '_' in text else text
+
+def parse_xlsx_text(elem)->str:
+    if elem.text is None: return ''
+    return cook_xlsx_text(elem.text, elem.get(XML_SPACE_ATTRIBUTE) == 'preserve')
+
+def is_date_format(format_code:str)->bool:
+    """same heuristics as xlrd.formatting.is_date_format_string, quoted text, escaped chars and [bracketed] parts are ignored,
+    then a format is date format if it has more ymdhs than 0#? placeholders"""
+    reduced = re.sub(r'"[^"]*"?|[\\_*].?|[$\-+/(): ]', '', format_code, flags=re.DOTALL)
+    reduced = re.sub(r'\[[^]]*\]', '', reduced)
+    if reduced in ('0.00E+00', '##0.0E+0', 'General', 'GENERAL', 'general', '@'): return False
+    return sum(reduced.count(x) for x in 'ymdhsYMDHS') > sum(reduced.count(x) for x in '0#?')
+
+def parse_xlsx_rich_text(elem)->str:
+    """text of shared string or inline string element, phonetic runs are excluded"""
+    text_list:list[str] = []
+    for child in elem:
+        if child.tag == XLSX_TEXT_TAG:
+            text_list.append(parse_xlsx_text(child))
+        elif child.tag == XLSX_RUN_TAG:
+            text_list.extend(parse_xlsx_text(x) for x in child if x.tag == XLSX_TEXT_TAG)
+    return ''.join(text_list)
+
+class XlsxRowParser(object):
+    """xml parser target turning worksheet rows into cell types and values without building xml elements,
+    cells without values are left empty as xlrd does without formatting info"""
+    def __init__(self, book:XlsxBook):
+        self.book = book
+        self.row_list:list[tuple[int, list[int], list[any]]] = [] # rows with values parsed from fed xml
+        self.__column_map:dict[str, int] = {}
+        self.__row_index = -1
+        self.__types:list[int] = None
+        self.__values:list[any] = None
+        self.__column = -1
+        self.__cell_attrib:dict[str, str] = None
+        self.__value:str = None
+        self.__text:list[str] = None # text pieces of v or t element being parsed
+        self.__preserve = False
+        self.__rich_text:list[str] = None
+        self.__phonetic = False
+
+    def start(self, tag:str, attrib:dict):
+        if tag == XLSX_CELL_TAG:
+            self.__cell_attrib = attrib
+            self.__value = self.__rich_text = None
+        elif tag == XLSX_VALUE_TAG:
+            self.__text = []
+            self.__preserve = attrib.get(XML_SPACE_ATTRIBUTE) == 'preserve'
+        elif tag == XLSX_ROW_TAG:
+            self.__row_index = int(attrib['r']) - 1 if 'r' in attrib else self.__row_index + 1
+            self.__types, self.__values = [], []
+            self.__column = -1
+        elif tag == XLSX_INLINE_TAG: self.__rich_text = []
+        elif tag == XLSX_TEXT_TAG:
+            if self.__rich_text is not None and not self.__phonetic:
+                self.__text = []
+                self.__preserve = attrib.get(XML_SPACE_ATTRIBUTE) == 'preserve'
+        elif tag == XLSX_PHONETIC_TAG: self.__phonetic = True
+
+    def data(self, text:str):
+        if self.__text is not None: self.__text.append(text)
+
+    def end(self, tag:str):
+        if tag == XLSX_VALUE_TAG:
+            self.__value = ''.join(self.__text)
+            self.__text = None
+        elif tag == XLSX_CELL_TAG: self.__add_cell()
+        elif tag == XLSX_ROW_TAG:
+            if self.__types: self.row_list.append((self.__row_index, self.__types, self.__values))
+        elif tag == XLSX_TEXT_TAG:
+            if self.__text is not None:
+                self.__rich_text.append(cook_xlsx_text(''.join(self.__text), self.__preserve))
+                self.__text = None
+        elif tag == XLSX_PHONETIC_TAG: self.__phonetic = False
+
+    def close(self): pass
+
+    def __get_column(self, name:str)->int:
+        letters = name.rstrip('0123456789')
+        column = self.__column_map.get(letters)
+        if column is None:
+            column = 0
+            for char in letters.replace('$', ''): column = column * 26 + ord(char) - 64
+            column = self.__column_map[letters] = column - 1
+        return column
+
+    def __add_cell(self):
+        attrib = self.__cell_attrib
+        name = attrib.get('r')
+        c = self.__column = self.__get_column(name) if name else self.__column + 1
+        cell_type = attrib.get('t', 'n')
+        text = self.__value
+        if cell_type == 'n':
+            if not text: return
+            ctype, value = XL_CELL_DATE if self.book.is_date_style(int(attrib.get('s', '0'))) else XL_CELL_NUMBER, float(text)
+        elif cell_type == 's':
+            if not text: return
+            ctype, value = XL_CELL_TEXT, self.book.shared_strings[int(text)]
+        elif cell_type == 'str': # cached result of formula
+            ctype, value = XL_CELL_TEXT, cook_xlsx_text(text, self.__preserve) if text is not None else None
+        elif cell_type == 'b':
+            ctype, value = XL_CELL_BOOLEAN, 1 if text in ('1', 'true', 'on') else 0
+        elif cell_type == 'e':
+            ctype, value = XL_CELL_ERROR, XLSX_ERROR_CODES[text or '#N/A']
+        elif cell_type == 'inlineStr':
+            if self.__rich_text is not None: text = ''.join(self.__rich_text)
+            if not text: return
+            ctype, value = XL_CELL_TEXT, text
+        else: raise ValueError('unknown cell type {!r} of cell {!r}'.format(cell_type, name))
+        types, values = self.__types, self.__values
+        count = len(types)
+        if c < count:
+            types[c], values[c] = ctype, value
+            return
+        if c > count:
+            types.extend([XL_CELL_EMPTY] * (c - count))
+            values.extend([''] * (c - count))
+        types.append(ctype)
+        values.append(value)
+
+class XlsxSheet(object):
+    """sheet of XlsxBook, rows are streamed from zip entry by iter_rows, or loaded on first random access"""
+    def __init__(self, book:XlsxBook, name:str, entry_name:str):
+        self.book = book
+        self.name = name
+        self.entry_name = entry_name
+        self.__types:list[list[int]] = None
+        self.__values:list[list[any]] = None
+        self.__widths:list[int] = None
+        self.__ncols:int = 0
+
+    def __iter_cells(self, start:int, stop:int): # type: (int, int)->Iterator[tuple[list[int], list[any]]]
+        from xml.etree import ElementTree
+        if stop is not None and stop <= start: return
+        r = 0 # index of next row
+        with self.book.open_zip() as book_file, book_file.open(self.entry_name) as fp:
+            row_parser = XlsxRowParser(self.book)
+            parser = ElementTree.XMLParser(target=row_parser)
+            while True:
+                chunk = fp.read(1 << 16)
+                if chunk: parser.feed(chunk)
+                else: parser.close()
+                row_list, row_parser.row_list = row_parser.row_list, []
+                for row_index, types, values in row_list:
+                    if row_index < r: raise ValueError('rows of sheet {!r} are not in ascending order'.format(self.name))
+                    while r < row_index:
+                        if r >= start: yield [], []
+                        r += 1
+                        if r == stop: return
+                    if r >= start: yield types, values
+                    r += 1
+                    if r == stop: return
+                if not chunk: break
+
+    def iter_rows(self, start:int = 0, stop:int = None): # type: (int, int)->Iterator[list[SheetCell]]
+        if self.__types is not None: # rows without padding, same as streamed rows
+            for r in range(start, self.nrows if stop is None else min(stop, self.nrows)): yield self.row(r)[:self.__widths[r]]
+            return
+        for types, values in self.__iter_cells(start, stop):
+            yield [SheetCell(t, v) for t, v in zip(types, values)]
+
+    def __load(self):
+        if self.__types is not None: return
+        type_rows, value_rows = [], []
+        for types, values in self.__iter_cells(0, None):
+            type_rows.append(types)
+            value_rows.append(values)
+        widths = [len(x) for x in type_rows]
+        ncols = max(widths, default=0)
+        for types, values in zip(type_rows, value_rows): # rows are padded as xlrd does
+            types.extend(XL_CELL_EMPTY for _ in range(ncols - len(types)))
+            values.extend('' for _ in range(ncols - len(values)))
+        self.__types, self.__values, self.__widths, self.__ncols = type_rows, value_rows, widths, ncols
+
+    @property
+    def loaded(self)->bool: return self.__types is not None
+
+    def release(self):
+        self.__types = self.__values = self.__widths = None
+
+    @property
+    def nrows(self)->int:
+        self.__load()
+        return len(self.__types)
+
+    @property
+    def ncols(self)->int:
+        self.__load()
+        return self.__ncols
+
+    def row(self, r:int)->list[SheetCell]:
+        self.__load()
+        return [SheetCell(t, v) for t, v in zip(self.__types[r], self.__values[r])]
+
+    def row_values(self, r:int)->list[any]:
+        self.__load()
+        return self.__values[r][:]
+
+    def cell(self, r:int, c:int)->SheetCell:
+        self.__load()
+        return SheetCell(self.__types[r][c], self.__values[r][c])
+
+    def cell_type(self, r:int, c:int)->int:
+        self.__load()
+        return self.__types[r][c]
+
+    def cell_value(self, r:int, c:int):
+        self.__load()
+        return self.__values[r][c]
+
+class MappedFile(io.RawIOBase):
+    """read only memory map of a file as seekable binary stream, which is unmapped when stream is closed"""
+    def __init__(self, filepath:str):
+        import mmap
+        super(MappedFile, self).__init__()
+        with open(filepath, 'rb') as fp: self.__map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def readable(self)->bool: return True
+    def seekable(self)->bool: return True
+    def tell(self)->int: return self.__map.tell()
+
+    def seek(self, offset:int, whence:int = io.SEEK_SET)->int:
+        self.__map.seek(offset, whence)
+        return self.__map.tell()
+
+    def readinto(self, buffer)->int:
+        data = self.__map.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size:int = -1)->bytes:
+        return self.__map.read(size if size is not None and size >= 0 else None)
+
+    def close(self):
+        if not self.closed: self.__map.close()
+        super(MappedFile, self).close()
+
+class XlsxBook(object):
+    """xlsx book read from zip entries with the part of xlrd.book.Book api used by flatcfg, which works without xlrd,
+    sheets are loaded on demand and their rows can be streamed, so memory scales with row width instead of book size"""
+    def __init__(self, filepath:str, use_mmap:bool = False):
+        from xml.etree import ElementTree
+        self.filepath = filepath
+        self.use_mmap = use_mmap
+        self.datemode = 0
+        self.logfile = None
+        self.shared_strings:list[str] = []
+        self.__date_styles:list[bool] = []
+        self.__sheets:list[XlsxSheet] = []
+        relation_namespace = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+        with self.open_zip() as book_file:
+            entry_map = {x.lower().replace('\\', '/'): x for x in book_file.namelist()}
+            relation_map:dict[str, tuple[str, str]] = {}
+            with book_file.open(entry_map['xl/_rels/workbook.xml.rels']) as fp:
+                for elem in ElementTree.parse(fp).getroot():
+                    target = elem.get('Target').replace('\\', '/').lower()
+                    relation_map[elem.get('Id')] = elem.get('Type').split('/')[-1], target[1:] if target.startswith('/') else 'xl/' + target
+            with book_file.open(entry_map['xl/workbook.xml']) as fp:
+                for elem in ElementTree.parse(fp).getroot().iter():
+                    if elem.tag == XLSX_NAMESPACE + 'workbookPr':
+                        self.datemode = 1 if elem.get('date1904') in ('1', 'true', 'on') else 0
+                    elif elem.tag == XLSX_NAMESPACE + 'sheet':
+                        relation_type, target = relation_map[elem.get(relation_namespace + 'id')]
+                        if relation_type != 'worksheet': continue
+                        self.__sheets.append(XlsxSheet(self, elem.get('name'), entry_map[target]))
+            if 'xl/styles.xml' in entry_map:
+                with book_file.open(entry_map['xl/styles.xml']) as fp: self.__load_styles(ElementTree.parse(fp).getroot())
+            if 'xl/sharedstrings.xml' in entry_map:
+                with book_file.open(entry_map['xl/sharedstrings.xml']) as fp:
+                    for _, elem in ElementTree.iterparse(fp):
+                        if elem.tag != XLSX_NAMESPACE + 'si': continue
+                        self.shared_strings.append(parse_xlsx_rich_text(elem))
+                        elem.clear()
+        self.__sheet_map = {x.name: x for x in self.__sheets}
+
+    def __load_styles(self, root):
+        format_map = {x: True for x in (*range(14, 23), *range(45, 48))} # builtin date formats
+        numfmts = root.find(XLSX_NAMESPACE + 'numFmts')
+        if numfmts is not None:
+            for elem in numfmts.iter(XLSX_NAMESPACE + 'numFmt'):
+                format_map[int(elem.get('numFmtId'))] = is_date_format(elem.get('formatCode'))
+        xfs = root.find(XLSX_NAMESPACE + 'cellXfs')
+        if xfs is not None:
+            self.__date_styles = [format_map.get(int(x.get('numFmtId', '0')), False) for x in xfs.iter(XLSX_NAMESPACE + 'xf')]
+
+    def open_zip(self)->zipfile.ZipFile:
+        """book file is read through a memory map with use_mmap, which is unmapped when zip file is closed"""
+        import zipfile
+        if not self.use_mmap: return zipfile.ZipFile(self.filepath)
+        return zipfile.ZipFile(MappedFile(self.filepath))
+
+    def is_date_style(self, style_index:int)->bool:
+        return style_index < len(self.__date_styles) and self.__date_styles[style_index]
+
+    @property
+    def nsheets(self)->int: return len(self.__sheets)
+
+    def sheets(self)->list[XlsxSheet]: return self.__sheets[:]
+    def sheet_names(self)->list[str]: return [x.name for x in self.__sheets]
+    def sheet_by_index(self, index:int)->XlsxSheet: return self.__sheets[index]
+
+    def sheet_by_name(self, name:str)->XlsxSheet:
+        sheet = self.__sheet_map.get(name)
+        if sheet is None: raise KeyError('no sheet named {!r}'.format(name))
+        return sheet
+
+    def __get_sheet(self, sheet_name_or_index)->XlsxSheet: # type: (str|int)->XlsxSheet
+        if isinstance(sheet_name_or_index, int): return self.sheet_by_index(sheet_name_or_index)
+        return self.sheet_by_name(sheet_name_or_index)
+
+    def sheet_loaded(self, sheet_name_or_index)->bool: # type: (str|int)->bool
+        return self.__get_sheet(sheet_name_or_index).loaded
+
+    def unload_sheet(self, sheet_name_or_index): # type: (str|int)->None
+        self.__get_sheet(sheet_name_or_index).release()
+
+    def release_resources(self):
+        for sheet in self.__sheets: sheet.release()
+
+__book_openers = {} # type: dict[str, callable]
+__book_mmap = True # map book files into memory instead of reading them
+__sheet_cache:str = None # directory of sheet cache files
+
+def register_book_opener(extension:str, opener): # type: (str, callable)->None
+    """sheet sources are chosen by book file extension, an opener returns a book with the xlrd.book.Book api used by flatcfg,
+    whose sheets are loaded on demand and may provide iter_rows(start, stop) for streaming rows,
+    opener is called with book file path and use_mmap"""
+    __book_openers[extension.lower()] = opener
+
+def open_xlrd_book(excel_filepath:str, use_mmap:bool = True)->xlrd.book.Book:
+    import xlrd
+    return xlrd.open_workbook(excel_filepath, on_demand=True, use_mmap=use_mmap)
+
+def open_workbook(excel_filepath:str)->xlrd.book.Book:
+    """open book without loading its sheets, sheets are loaded by sheet_by_name and should be unloaded by unload_sheet once used"""
+    opener = __book_openers.get(p.splitext(excel_filepath)[1].lower(), open_xlrd_book)
+    if __sheet_cache: return CachedBook(excel_filepath, __sheet_cache, opener, use_mmap=__book_mmap)
+    return opener(excel_filepath, use_mmap=__book_mmap)
+
+def is_book_preloadable(excel_filepath:str)->bool:
+    """only xlrd books are loaded ahead by pipeline reader, streaming and cached sheets are read from file where they are used,
+    so loading them on reader process would read them twice"""
+    return not __sheet_cache and __book_openers.get(p.splitext(excel_filepath)[1].lower(), open_xlrd_book) is open_xlrd_book
+
+def set_book_mmap(use_mmap:bool):
+    global __book_mmap
+    __book_mmap = use_mmap
+
+def set_sheet_cache(cache_dir:str):
+    """read sheets from sheet cache files in cache_dir instead of decoding books, None for no cache"""
+    global __sheet_cache
+    __sheet_cache = cache_dir
+
+def get_loaded_sheets(book:xlrd.book.Book)->list[xlrd.sheet.Sheet]:
+    return [book.sheet_by_index(n) for n in range(book.nsheets) if book.sheet_loaded(n)]
+
+def unload_sheet(book:xlrd.book.Book, sheet_name:str):
+    """unload a sheet which can be loaded again, sheets of books whose resources are released stay"""
+    if not getattr(book, '_resources_released', False): book.unload_sheet(sheet_name)
+
+register_book_opener('.xlsx', XlsxBook)
+register_book_opener('.xlsm', XlsxBook)
+
+def update_row_digest(md5, cell_list:list[tuple[int, any]]): # type: (hashlib._Hash, list[tuple[int, any]])->None
+    md5.update(repr(cell_list).encode('utf-8'))
+
+def get_file_digest(filepath:str)->str:
+    md5 = hashlib.md5()
+    with open(filepath, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b''): md5.update(chunk)
+    return md5.hexdigest()
+
+def write_sheet_cache(filepath:str, sheet:xlrd.sheet.Sheet, book_digest:str)->str:
+    """write cells of sheet into a sheet cache file and return sheet digest, cell types and values are stored column by column,
+    text values are indices of a string table and other values are float64 numbers"""
+    import array
+    md5 = hashlib.md5()
+    md5.update(sheet.name.encode('utf-8'))
+    row_types, row_values = bytearray(), array.array('d') # cells of rows without padding
+    widths:list[int] = []
+    string_map:dict[str, int] = {}
+    for row in iter_rows(sheet):
+        cell_list = [(cell.ctype, cell.value) for cell in row]
+        update_row_digest(md5, cell_list)
+        widths.append(len(cell_list))
+        for ctype, value in cell_list:
+            if ctype == XL_CELL_TEXT:
+                if value is None: value = -1
+                elif type(value) is str: value = string_map.setdefault(value, len(string_map))
+                else: raise ValueError('text cell {!r} of {!r} is not a string'.format(value, sheet.name))
+            elif ctype == XL_CELL_NUMBER or ctype == XL_CELL_DATE:
+                if type(value) is not float: raise ValueError('number cell {!r} of {!r} is not a float'.format(value, sheet.name))
+            elif ctype == XL_CELL_BOOLEAN or ctype == XL_CELL_ERROR:
+                if type(value) is not int: raise ValueError('cell {!r} of {!r} is not an integer'.format(value, sheet.name))
+            elif value != '': raise ValueError('empty cell {!r} of {!r} has value'.format(value, sheet.name))
+            else: value = 0
+            row_types.append(ctype)
+            row_values.append(value)
+    nrows, ncols = len(widths), max(widths, default=0)
+    types = bytearray(nrows * ncols)
+    values = array.array('d', bytes(8 * nrows * ncols))
+    offset = 0
+    for r, width in enumerate(widths): # columns are stored one after another
+        types[r:r + nrows * width:nrows] = row_types[offset:offset + width]
+        values[r:r + nrows * width:nrows] = row_values[offset:offset + width]
+        offset += width
+    text_list = [x.encode('utf-8') for x in string_map]
+    offsets = array.array('I', [0])
+    for text in text_list: offsets.append(offsets[-1] + len(text))
+    byte_order = b'<' if sys.byteorder == 'little' else b'>'
+    header = SHEET_CACHE_HEADER.pack(SHEET_CACHE_MAGIC, SHEET_CACHE_VERSION, byte_order, bytes.fromhex(book_digest),
+                                     nrows, ncols, len(text_list), md5.digest())
+    header += bytes(-len(header) % 8) # float64 columns are aligned
+    write_file(filepath, b''.join([header, values.tobytes(), offsets.tobytes(), bytes(types), *text_list]))
+    return md5.hexdigest()
+
+class CachedSheet(object):
+    """sheet read from a sheet cache file with the part of xlrd.sheet.Sheet api used by flatcfg,
+    cache file is memory mapped on first access and cell values are only decoded when they are used"""
+    def __init__(self, name:str, filepath:str, use_mmap:bool = True):
+        self.name = name
+        self.filepath = filepath
+        self.use_mmap = use_mmap
+        with open(filepath, 'rb') as fp: header = fp.read(SHEET_CACHE_HEADER.size)
+        if len(header) != SHEET_CACHE_HEADER.size: raise ValueError('broken sheet cache {!r}'.format(filepath))
+        magic, version, byte_order, book_digest, self.nrows, self.ncols, self.__string_count, digest = SHEET_CACHE_HEADER.unpack(header)
+        if magic != SHEET_CACHE_MAGIC or version != SHEET_CACHE_VERSION or byte_order != (b'<' if sys.byteorder == 'little' else b'>'):
+            raise ValueError('incompatible sheet cache {!r}'.format(filepath))
+        self.book_digest = book_digest.hex()
+        self.flatcfg_digest = digest.hex()
+        self.__buffer = None # type: mmap.mmap|bytes
+        self.__values:memoryview = None
+        self.__types:memoryview = None
+        self.__offsets:memoryview = None
+        self.__text:memoryview = None
+        self.__strings:list[str] = None
+
+    def __getstate__(self): # memory map is not sent to other processes
+        return {'name': self.name, 'filepath': self.filepath, 'use_mmap': self.use_mmap}
+
+    def __setstate__(self, state:dict):
+        self.__init__(**state)
+
+    def __load(self):
+        if self.__buffer is not None: return
+        with open(self.filepath, 'rb') as fp:
+            if self.use_mmap:
+                import mmap
+                buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            else: buffer = fp.read()
+        count = self.nrows * self.ncols
+        offset = SHEET_CACHE_HEADER.size + (-SHEET_CACHE_HEADER.size % 8)
+        view = memoryview(buffer)
+        self.__values = view[offset:offset + 8 * count].cast('d')
+        offset += 8 * count
+        self.__offsets = view[offset:offset + 4 * (self.__string_count + 1)].cast('I')
+        offset += 4 * (self.__string_count + 1)
+        self.__types = view[offset:offset + count]
+        self.__text = view[offset + count:]
+        view.release()
+        self.__strings = [None] * self.__string_count
+        self.__buffer = buffer
+
+    def release(self):
+        if self.__buffer is None: return
+        for view in (self.__values, self.__offsets, self.__types, self.__text): view.release()
+        if self.use_mmap: self.__buffer.close()
+        self.__buffer = self.__values = self.__offsets = self.__types = self.__text = self.__strings = None
+
+    def __get_string(self, index:int)->str:
+        if index < 0: return None
+        text = self.__strings[index]
+        if text is None: text = self.__strings[index] = str(self.__text[self.__offsets[index]:self.__offsets[index + 1]], 'utf-8')
+        return text
+
+    def __get_value(self, index:int):
+        ctype = self.__types[index]
+        if ctype == XL_CELL_TEXT: return self.__get_string(int(self.__values[index]))
+        if ctype == XL_CELL_NUMBER or ctype == XL_CELL_DATE: return self.__values[index]
+        if ctype == XL_CELL_BOOLEAN or ctype == XL_CELL_ERROR: return int(self.__values[index])
+        return ''
+
+    def row(self, r:int)->list[SheetCell]:
+        self.__load()
+        nrows = self.nrows
+        return [SheetCell(self.__types[index], self.__get_value(index)) for index in range(r, r + nrows * self.ncols, nrows)]
+
+    def row_values(self, r:int)->list[any]:
+        self.__load()
+        nrows = self.nrows
+        return [self.__get_value(index) for index in range(r, r + nrows * self.ncols, nrows)]
+
+    def cell(self, r:int, c:int)->SheetCell:
+        self.__load()
+        index = c * self.nrows + r
+        return SheetCell(self.__types[index], self.__get_value(index))
+
+    def cell_type(self, r:int, c:int)->int:
+        self.__load()
+        return self.__types[c * self.nrows + r]
+
+    def cell_value(self, r:int, c:int):
+        self.__load()
+        return self.__get_value(c * self.nrows + r)
+
+class CachedBook(object):
+    """book whose sheets are read from sheet cache files, a sheet missing from cache is loaded from book file and written into cache,
+    cache of a book is kept in a directory keyed by book path, and is valid while book has the same mtime and size or content digest"""
+    def __init__(self, filepath:str, cache_dir:str, opener, use_mmap:bool = True): # type: (str, str, callable, bool)->None
+        self.filepath = filepath
+        self.directory = p.join(cache_dir, hashlib.md5(p.abspath(filepath).encode('utf-8')).hexdigest())
+        self.opener = opener
+        self.use_mmap = use_mmap
+        self.logfile = None
+        self.__book:xlrd.book.Book = None
+        self.__sheets:dict[int, CachedSheet|xlrd.sheet.Sheet] = {}
+        index = self.__load_index()
+        if not index:
+            book = self.__open_book()
+            index = {'version': SHEET_CACHE_VERSION, 'stat': get_book_stat(filepath), 'digest': get_file_digest(filepath),
+                     'datemode': book.datemode, 'sheets': book.sheet_names()}
+            if not p.exists(self.directory): os.makedirs(self.directory)
+            write_file(p.join(self.directory, SHEET_CACHE_INDEX_NAME), json.dumps(index).encode('utf-8'))
+        self.digest:str = index['digest']
+        self.datemode:int = index['datemode']
+        self.__names:list[str] = index['sheets']
+
+    def __load_index(self)->dict:
+        index_filepath = p.join(self.directory, SHEET_CACHE_INDEX_NAME)
+        try:
+            with open(index_filepath) as fp: index = json.load(fp)
+        except (OSError, ValueError): return None
+        if index.get('version') != SHEET_CACHE_VERSION: return None
+        stat = get_book_stat(self.filepath)
+        if stat and index.get('stat') == list(stat): return index
+        if not stat or index.get('digest') != get_file_digest(self.filepath): return None
+        index['stat'] = stat # touched without changes
+        write_file(index_filepath, json.dumps(index).encode('utf-8'))
+        return index
+
+    def __open_book(self)->xlrd.book.Book:
+        if self.__book is None: self.__book = self.opener(self.filepath, use_mmap=self.use_mmap)
+        return self.__book
+
+    @property
+    def nsheets(self)->int: return len(self.__names)
+
+    def sheet_names(self)->list[str]: return self.__names[:]
+    def sheets(self)->list[CachedSheet]: return [self.sheet_by_index(n) for n in range(self.nsheets)]
+
+    def sheet_by_index(self, index:int)->CachedSheet:
+        sheet = self.__sheets.get(index)
+        if sheet is not None: return sheet
+        name = self.__names[index]
+        filepath = p.join(self.directory, '{}.sheet'.format(index))
+        try:
+            sheet = CachedSheet(name, filepath, use_mmap=self.use_mmap)
+            if sheet.book_digest != self.digest: sheet = None
+        except (OSError, ValueError): sheet = None
+        if sheet is None:
+            book = self.__open_book()
+            source = book.sheet_by_index(index)
+            try:
+                write_sheet_cache(filepath, source, self.digest)
+                sheet = CachedSheet(name, filepath, use_mmap=self.use_mmap)
+                unload_sheet(book, index)
+            except ValueError: sheet = source # cells can't be cached
+        self.__sheets[index] = sheet
+        return sheet
+
+    def sheet_by_name(self, name:str)->CachedSheet:
+        if name not in self.__names: raise KeyError('no sheet named {!r}'.format(name))
+        return self.sheet_by_index(self.__names.index(name))
+
+    def sheet_loaded(self, sheet_name_or_index)->bool: # type: (str|int)->bool
+        if not isinstance(sheet_name_or_index, int): sheet_name_or_index = self.__names.index(sheet_name_or_index)
+        return sheet_name_or_index in self.__sheets
+
+    def unload_sheet(self, sheet_name_or_index): # type: (str|int)->None
+        if not isinstance(sheet_name_or_index, int): sheet_name_or_index = self.__names.index(sheet_name_or_index)
+        sheet = self.__sheets.pop(sheet_name_or_index, None)
+        if isinstance(sheet, CachedSheet): sheet.release()
+        elif sheet is not None: unload_sheet(self.__open_book(), sheet_name_or_index)
+
+    def release_resources(self):
+        """book file is closed and cache files are unmapped, sheets are mapped again when they are used"""
+        for sheet in self.__sheets.values():
+            if isinstance(sheet, CachedSheet): sheet.release()
+        if self.__book is not None:
+            self.__book.release_resources()
+            self.__book = None
+
+__book_cache = {} # type: dict[str, tuple[tuple[int, int], xlrd.book.Book]]
+__book_cache_limit = 1 # books kept open, 0 for no limit
+
+def get_book_stat(excel_filepath:str)->tuple[int, int]:
+    try:
+        stat = os.stat(excel_filepath)
+    except OSError: return None
+    return stat.st_mtime_ns, stat.st_size
+
+def open_book(excel_filepath:str, book:xlrd.book.Book = None)->xlrd.book.Book:
+    """keep only the book in use, a book loaded by pipeline reader replaces it, and a book saved since loading is reopened"""
+    stat = get_book_stat(excel_filepath)
+    cache = __book_cache.pop(excel_filepath, None)
+    if cache and cache[0] == stat and (book is None or book is cache[1]):
+        __book_cache[excel_filepath] = cache # most recently used
+        return cache[1]
+    if cache: cache[1].release_resources()
+    while __book_cache and 0 < __book_cache_limit <= len(__book_cache):
+        __book_cache.pop(next(iter(__book_cache)))[1].release_resources()
+    if book is None: book = open_workbook(excel_filepath)
+    __book_cache[excel_filepath] = stat, book
+    return book
+
+def set_book_cache_limit(limit:int):
+    global __book_cache_limit
+    __book_cache_limit = limit
+
+def is_same_content(filepath:str, data:bytes)->bool:
+    try:
+        if os.stat(filepath).st_size != len(data): return False
+    except OSError: return False
+    with open(filepath, 'rb') as fp: return fp.read() == data
+
+def replace_file(temp_filepath:str, filepath:str)->bool:
+    """move temp file onto filepath unless they have same content, untouched files keep their mtime for asset importers"""
+    import filecmp
+    if p.exists(filepath) and filecmp.cmp(temp_filepath, filepath, shallow=False):
+        os.remove(temp_filepath)
+        return False
+    os.replace(temp_filepath, filepath)
+    return True
+
+def write_file(filepath:str, data:bytes, verify = None)->bool: # type: (str, bytes, callable)->bool
+    """write through a temp file and rename so readers never see partial files, returns False if file was unchanged"""
+    changed = not is_same_content(filepath, data)
+    if changed:
+        temp_filepath = '{}.{}.tmp'.format(filepath, os.getpid())
+        try:
+            with open(temp_filepath, 'wb') as fp: fp.write(data)
+            os.replace(temp_filepath, filepath)
+        finally:
+            if p.exists(temp_filepath): os.remove(temp_filepath)
+    if verify:
+        with open(filepath, 'rb') as fp: verify(bytearray(fp.read()))
+    return changed
+
+def copy_file(source_filepath:str, filepath:str)->bool:
+    with open(source_filepath, 'rb') as fp: return write_file(filepath, fp.read())
+
+class PipelineStage(object):
+    """run submitted calls in order on a thread, submitting blocks while depth calls are queued"""
+    def __init__(self, depth:int):
+        import queue, threading
+        self.queue = queue.Queue(maxsize=max(1, depth))
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        while True:
+            item = self.queue.get()
+            if item is None: break
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as error:
+                future.set_exception(error)
+
+    def submit(self, fn, *args): # type: (callable, any)->Future
+        from concurrent.futures import Future
+        future = Future()
+        self.queue.put((future, fn, args))
+        return future
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+def load_book(excel_filepath:str)->xlrd.book.Book:
+    """open book in reader process and load its data sheets, book file is released and log files are dropped
+    so that book can be sent back, see is_book_preloadable"""
+    book = open_workbook(excel_filepath)
+    for name in book.sheet_names(): # type: str
+        if name.isupper(): book.sheet_by_name(name)
+    book.release_resources()
+    book.logfile = None
+    for sheet in get_loaded_sheets(book): sheet.logfile = None
+    return book
+
+class BookReader(object):
+    """load books in order on a reader process ahead of use, at most depth loaded books wait for parsing"""
+    def __init__(self, book_list:list[str], depth:int):
+        import collections
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(max_workers=1)
+        self.depth = max(1, depth)
+        self.book_list = collections.deque(book_list)
+        self.futures = collections.deque() # type: collections.deque[tuple[str, Future]]
+        self.__submit()
+
+    def __submit(self):
+        while self.book_list and len(self.futures) < self.depth:
+            excel_filepath = self.book_list.popleft()
+            self.futures.append((excel_filepath, self.executor.submit(load_book, excel_filepath)))
+
+    def next(self)->tuple[str, xlrd.book.Book]:
+        excel_filepath, future = self.futures.popleft()
+        self.__submit()
+        try:
+            book = future.result()
+        except Exception: # reopened by sheet builder to report the error
+            return excel_filepath, None
+        book.logfile = sys.stdout
+        for sheet in get_loaded_sheets(book): sheet.logfile = sys.stdout
+        return excel_filepath, book
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+def create_serializer(options, enum_map = None)->SheetSerializer:
+    serializer = SheetSerializer(debug=options.debug, enum_map=enum_map)
+    if enum_map is None:
+        if options.use_protobuf:
+            serializer.optimize_enum_map(auto_prepend_prefix=True, unique_case_name=True)
+        else:
+            serializer.optimize_enum_map(auto_prepend_prefix=options.enum_prefix, unique_case_name=options.enum_unique)
+    serializer.compatible_mode = options.compatible_mode
+    serializer.signed_encoding = not options.unsigned_encoding
+    if options.fixed32:
+        serializer.fixed32_codec = FixedCodec(fraction_bits=options.fixed32_fraction_bits, type_size=32)
+    if options.fixed64:
+        serializer.fixed64_codec = FixedCodec(fraction_bits=options.fixed64_fraction_bits, type_size=64)
+    return serializer
+
+def create_encoder(options, datemode:int)->BookEncoder:
+    if options.use_protobuf:
+        encoder = ProtobufEncoder(workspace=options.workspace, debug=options.debug)
+    else:
+        encoder = FlatbufEncoder(workspace=options.workspace, debug=options.debug)
+    encoder.access = FieldAccess.get_value(options.access)
+    encoder.force_null = options.force_null
+    if options.use_protobuf:
+        encoder.use_descriptor_pool = options.no_protoc
+        encoder.use_wire_format = options.wire_format
+        encoder.use_streaming = options.stream
+        encoder.row_jobs = options.row_jobs if options.row_jobs > 0 else os.cpu_count()
+        encoder.chunk_rows = max(1, options.chunk_rows)
+        encoder.use_row_cache = options.row_cache
+    else:
+        encoder.use_builder_slots = options.no_flatc
+    encoder.datemode = datemode
+    encoder.artifact_cache = ArtifactCache(options.artifact_cache) if options.artifact_cache else None
+    encoder.set_package_name(options.namespace)
+    encoder.set_timezone(options.time_zone)
+    return encoder
+
+class BuildManifest(object):
+    """fingerprints of sheets built in workspace, used for skipping unchanged sheets"""
+    def __init__(self, workspace:str):
+        self.filepath = p.join(workspace, MANIFEST_NAME)
+        self.sheet_map:dict[str, dict[str, any]] = {}
+        if p.exists(self.filepath):
+            with open(self.filepath) as fp:
+                data = json.load(fp)
+                if data.get('version') == VERSION: self.sheet_map = data.get('sheets', {})
+
+    def get_key(self, sheet_name:str, options)->str:
+        return '{}:{}'.format('protobuf' if options.use_protobuf else 'flatbuffers', sheet_name)
+
+    def get(self, key:str)->Dict[str, any]:
+        return self.sheet_map.get(key)
+
+    def update(self, key:str, fingerprint:str, artifacts, size:int = 0, row_count:int = 0, header_fingerprint:str = None): # type: (str, str, list[str], int, int, str)->None
+        """size and row count of binary output are kept for results of skipped sheets,
+        schema of a sheet whose header fingerprint is unchanged is not written again"""
+        self.sheet_map[key] = {'fingerprint': fingerprint, 'artifacts': artifacts, 'size': size, 'rows': row_count, 'header': header_fingerprint}
+
+    def remove(self, key:str):
+        if key in self.sheet_map: del self.sheet_map[key]
+
+    def save(self):
+        write_file(self.filepath, json.dumps({'version': VERSION, 'sheets': self.sheet_map}, indent=4, sort_keys=True).encode('utf-8'))
+
+class RowCache(object):
+    """encoded row messages of a sheet keyed by row content, only valid for the schema digest they were encoded with"""
+    def __init__(self, filepath:str, schema_digest:str):
+        self.filepath = filepath
+        self.schema_digest = schema_digest
+        self.hit_count = 0
+        self.__rows:dict[bytes, bytes] = {}
+        self.__used_rows:dict[bytes, bytes] = {}
+        if p.exists(filepath):
+            import pickle
+            try:
+                with open(filepath, 'rb') as fp: data = pickle.load(fp)
+            except Exception: data = {} # broken cache is rebuilt
+            if data.get('version') == VERSION and data.get('schema') == schema_digest:
+                self.__rows = data.get('rows')
+
+    @staticmethod
+    def get_digest(row)->bytes: # type: (list[any])->bytes
+        return hashlib.md5(repr(row).encode('utf-8')).digest()
+
+    def get(self, digest:bytes)->bytes:
+        message = self.__rows.get(digest)
+        if message is not None: self.hit_count += 1
+        return message
+
+    def put(self, digest:bytes, message:bytes):
+        self.__used_rows[digest] = message
+
+    def save(self):
+        """only rows of current build are kept"""
+        import pickle
+        if not p.exists(p.dirname(self.filepath)): os.makedirs(p.dirname(self.filepath), exist_ok=True)
+        temp_filepath = '{}.{}.tmp'.format(self.filepath, os.getpid())
+        with open(temp_filepath, 'wb') as fp:
+            pickle.dump({'version': VERSION, 'schema': self.schema_digest, 'rows': self.__used_rows}, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filepath, self.filepath)
+
+class ArtifactCache(object):
+    """content addressed store of build outputs in a plain directory, which can be shared by machines and workspaces,
+    an entry is published by renaming a complete temporary directory, so readers never see partial entries"""
+    def __init__(self, root:str):
+        self.root = p.abspath(root)
+
+    def get_entry_path(self, kind:str, key:str)->str:
+        return p.join(self.root, kind, key[:2], key)
+
+    def load(self, kind:str, key:str, base_dir:str)->list[str]:
+        """copy files of entry into base_dir, returns their paths or None if entry not found"""
+        entry_path = self.get_entry_path(kind, key)
+        try:
+            with open(p.join(entry_path, ARTIFACT_INDEX_NAME)) as fp: name_list:list[str] = json.load(fp)
+        except (OSError, ValueError): return None
+        filepath_list:list[str] = []
+        for name in name_list:
+            filepath = p.join(base_dir, name)
+            if not p.exists(p.dirname(filepath)): os.makedirs(p.dirname(filepath), exist_ok=True)
+            copy_file(p.join(entry_path, name), filepath)
+            filepath_list.append(filepath)
+        return filepath_list
+
+    def load_info(self, kind:str, key:str)->Dict[str, any]:
+        """info saved with entry, empty if entry has no info"""
+        try:
+            with open(p.join(self.get_entry_path(kind, key), ARTIFACT_INFO_NAME)) as fp: return json.load(fp)
+        except (OSError, ValueError): return {}
+
+    def save(self, kind:str, key:str, filepath_list, base_dir:str, info = None): # type: (str, str, list[str], str, dict)->None
+        """store files with their paths relative to base_dir, entries are immutable once published"""
+        import shutil
+        entry_path = self.get_entry_path(kind, key)
+        if p.exists(entry_path): return
+        temp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+        if p.exists(temp_path): shutil.rmtree(temp_path)
+        name_list:list[str] = []
+        for filepath in filepath_list:
+            name = p.relpath(filepath, base_dir)
+            target_filepath = p.join(temp_path, name)
+            if not p.exists(p.dirname(target_filepath)): os.makedirs(p.dirname(target_filepath))
+            shutil.copyfile(filepath, target_filepath)
+            name_list.append(name)
+        with open(p.join(temp_path, ARTIFACT_INDEX_NAME), 'w') as fp: json.dump(name_list, fp, indent=4)
+        if info:
+            with open(p.join(temp_path, ARTIFACT_INFO_NAME), 'w') as fp: json.dump(info, fp, indent=4)
+        try:
+            os.rename(temp_path, entry_path)
+        except OSError: # same entry published by another build
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+def get_enum_version(enum_map:Dict[str, Dict[str, int]])->str:
+    return hashlib.md5(json.dumps(enum_map, sort_keys=True).encode('utf-8')).hexdigest()
+
+def get_sheet_digest(sheet:xlrd.sheet.Sheet)->str:
+    """digest of sheet cells, which is kept on sheet object as books are reopened after saving"""
+    digest = getattr(sheet, 'flatcfg_digest', None)
+    if digest: return digest
+    md5 = hashlib.md5()
+    md5.update(sheet.name.encode('utf-8'))
+    for row in iter_rows(sheet): # streaming sheets are not loaded for digest
+        update_row_digest(md5, [(cell.ctype, cell.value) for cell in row])
+    digest = sheet.flatcfg_digest = md5.hexdigest()
+    return digest
+
+def get_sheet_artifacts(sheet_name:str, options)->list[str]:
+    """schema and binary output names of a sheet"""
+    name = sheet_name.lower()
+    if options.use_protobuf: return ['{}.proto'.format(name), '{}.ppb'.format(name)]
+    return ['{}.fbs'.format(name), '{}.fpb'.format(name)]
+
+def get_sheet_fingerprint(sheet_digest:str, options, enum_version:str, datemode:int)->str:
+    md5 = hashlib.md5()
+    settings = [VERSION, enum_version, datemode, sheet_digest, options.use_protobuf, options.access, options.namespace,
+                options.force_null, options.time_zone, options.compatible_mode, options.unsigned_encoding,
+                options.fixed32 and options.fixed32_fraction_bits, options.fixed64 and options.fixed64_fraction_bits, options.auto_default_case]
+    md5.update(repr(settings).encode('utf-8'))
+    return md5.hexdigest()
+
+class SheetResult(object):
+    def __init__(self, excel_filepath:str, sheet_name:str):
+        self.excel_filepath = excel_filepath
+        self.sheet_name = sheet_name
+        self.log:str = ''
+        self.error:str = None
+        self.fingerprint:str = None
+        self.header_fingerprint:str = None # fingerprint of header rows and schema settings
+        self.artifacts:list[str] = []
+        self.skipped:bool = False # unchanged since last build, outputs are kept
+        self.restored:bool = False # copied from artifact cache
+        self.target:str = None # format:access
+        self.size:int = 0 # bytes of binary output
+        self.row_count:int = 0
+        self.parse_time:float = 0 # seconds of parsing sheet, which is shared by all targets of a sheet
+        self.encode_time:float = 0
+        self.output_futures = [] # type: list[Future] # outputs queued in writer stage of build pipeline
+
+    @property
+    def status(self)->str:
+        """failed, skipped, restored or built, size and row count of skipped and restored sheets are those of kept outputs"""
+        if self.error: return 'failed'
+        if self.skipped: return 'skipped'
+        if self.restored: return 'restored'
+        return 'built'
+
+class EnumColumn(object):
+    def __init__(self, enum:str, default:str, offset:int):
+        self.enum = enum
+        self.default = default
+        self.offset = offset
+        self.case_list:list[str] = []
+
+class HeaderScanner(Codec):
+    """find enum columns from header rows and collect their cases without parsing whole table syntax"""
+    def __init__(self):
+        super(HeaderScanner, self).__init__()
+        self.debug = False
+
+    def scan(self, sheet:xlrd.sheet.Sheet, header_only:bool = False): # type: (xlrd.sheet.Sheet, bool)->tuple[SheetHeader, list[EnumColumn]]
+        """read header rows and collect enum cases in one pass over streamed rows,
+        data rows are not read with header_only, so enum columns have no cases"""
+        import itertools
+        rows = iter_rows(sheet, 0, ROW_DATA_INDEX) if header_only else iter_rows(sheet)
+        header_rows = list(itertools.islice(rows, ROW_DATA_INDEX))
+        header = SheetHeader(sheet.name, header_rows)
+        column_list:list[EnumColumn] = []
+        if header.nrows == ROW_DATA_INDEX:
+            ignore_charset = '\uff0a* '
+            for c in range(header.ncols):
+                if header.cell_type(ROW_RULE_INDEX, c) != XL_CELL_TEXT: continue
+                field_rule = header.cell_value(ROW_RULE_INDEX, c).strip()  # type: str
+                field_type = str(header.cell_value(ROW_TYPE_INDEX, c)).strip()  # type: str
+                if field_rule in ignore_charset or field_type in ignore_charset: continue
+                if self.is_int(field_type) or not field_type.startswith('enum.'): continue
+                field_name = str(header.cell_value(ROW_NAME_INDEX, c)).strip()  # type: str
+                sep = field_name.find('=')
+                column_list.append(EnumColumn(re.sub(r'^enum\.', '', field_type), field_name[sep+1:] if sep > 0 else '', c))
+        if header_only: pass
+        elif hasattr(sheet, 'iter_rows'):
+            for row in rows:
+                header.add_row(row)
+                for column in column_list:
+                    if column.offset < len(row): self.__add_cases(column, row[column.offset])
+        else: # random access sheets only read enum columns
+            header.row_count = max(header.row_count, sheet.nrows)
+            for column in column_list:
+                for r in range(ROW_DATA_INDEX, sheet.nrows): self.__add_cases(column, sheet.cell(r, column.offset))
+        return header, column_list
+
+    def __add_cases(self, column:EnumColumn, cell:xlrd.sheet.Cell):
+        if cell.ctype != XL_CELL_TEXT: return
+        for case_name in self.parse_array(str(cell.value).strip()):
+            if case_name not in column.case_list: column.case_list.append(case_name)
+
+class SheetHeader(object):
+    """header rows of a sheet, which are all that needed for parsing table syntax"""
+    def __init__(self, name:str, rows): # type: (str, list[list[xlrd.sheet.Cell]])->None
+        self.name:str = name
+        self.nrows:int = len(rows)
+        self.ncols:int = max((len(x) for x in rows), default=0)
+        self.row_count:int = len(rows)
+        self.__rows = [x + [EMPTY_CELL] * (self.ncols - len(x)) for x in rows] # type: list[list[xlrd.sheet.Cell]]
+
+    def add_row(self, row): # type: (list[xlrd.sheet.Cell])->None
+        """count a data row, sheet width covers data rows as well"""
+        self.row_count += 1
+        if len(row) > self.ncols:
+            for cells in self.__rows: cells.extend(EMPTY_CELL for _ in range(len(row) - len(cells)))
+            self.ncols = len(row)
+
+    def row(self, r:int): return self.__rows[r]
+    def cell(self, r:int, c:int)->xlrd.sheet.Cell: return self.__rows[r][c]
+    def cell_type(self, r:int, c:int)->int: return self.__rows[r][c].ctype
+    def cell_value(self, r:int, c:int): return self.__rows[r][c].value
+
+def read_header(sheet:xlrd.sheet.Sheet)->SheetHeader:
+    """header rows of a sheet without reading its data rows"""
+    return SheetHeader(sheet.name, list(iter_rows(sheet, 0, ROW_DATA_INDEX)))
+
+def get_header_digest(header:SheetHeader)->str:
+    """digest of what table syntax is parsed from, header cells and sheet width"""
+    md5 = hashlib.md5()
+    md5.update('{}:{}'.format(header.name, header.ncols).encode('utf-8'))
+    for r in range(header.nrows): update_row_digest(md5, [(cell.ctype, cell.value) for cell in header.row(r)])
+    return md5.hexdigest()
+
+def get_schema_files(schema_filepath:str)->list[str]:
+    """schemas included by a schema and itself, None if any of them is missing"""
+    if not p.exists(schema_filepath): return None
+    with open(schema_filepath) as fp: include_list = re.findall(r'^(?:include|import) "([^"]+)";', fp.read(), re.MULTILINE)
+    filepath_list = [p.join(p.dirname(schema_filepath), x) for x in include_list] + [schema_filepath]
+    return filepath_list if all(p.exists(x) for x in filepath_list) else None
+
+def scan_book(excel_filepath:str, header_only:bool = False): # type: (str, bool)->list[tuple[str, SheetHeader, list[EnumColumn]]]
+    scanner = HeaderScanner()
+    book = open_book(excel_filepath)
+    scan_list = []
+    for name in book.sheet_names(): # type: str
+        if not name.isupper(): continue
+        sheet = book.sheet_by_name(name)
+        scan_list.append((name, *scanner.scan(sheet, header_only)))
+        if header_only: unload_sheet(book, name) # data rows are never used
+    return scan_list
+
+def get_book_list(options)->list[str]:
+    return [x for x in options.excel_file if not p.basename(x).startswith('~$')]
+
+def scan_books(options, executor = None, session = None): # type: (object, object, BuildSession)->list[tuple[str, list[tuple[str, SheetHeader, list[EnumColumn]]]]]
+    book_list = get_book_list(options)
+    if not session:
+        scan_list = executor.map(scan_book, book_list) if executor else [scan_book(x) for x in book_list]
+        return list(zip(book_list, scan_list))
+    # books unchanged since last build of session are not scanned again
+    stat_map = {x: get_book_stat(x) for x in book_list}
+    changed_books = [x for x in book_list if not stat_map[x] or session.scan_map.get(x, (None,))[0] != stat_map[x]]
+    scan_list = executor.map(scan_book, changed_books) if executor else [scan_book(x) for x in changed_books]
+    for excel_filepath, scan in zip(changed_books, scan_list):
+        session.scan_map[excel_filepath] = stat_map[excel_filepath], scan
+    return [(x, session.scan_map[x][1]) for x in book_list]
+
+class BuildSession(object):
+    """state kept by a watching process between builds"""
+    def __init__(self):
+        self.scan_map = {} # type: dict[str, tuple[tuple[int, int], list]]
+        self.enum_versions = {} # type: dict[str, str]
+        self.book_filter = None # type: set[str] # only sheets of these books are built while enum map is unchanged
+        self.executor = None # type: ProcessPoolExecutor
+
+class BuildPlan(object):
+    def __init__(self):
+        self.sheet_list:list[tuple[str, str]] = []
+        self.header_map:dict[tuple[str, str], SheetHeader] = {}
+        self.enum_map:dict[str, dict[str, int]] = {}
+
+def plan_build(options, executor = None, book_scans = None, save_enums:bool = True)->BuildPlan:
+    """scan books concurrently, then import enum cases in book order and freeze a single enum map for the whole build"""
+    plan = BuildPlan()
+    if book_scans is None: book_scans = scan_books(options, executor)
+    serializer = create_serializer(options)
+    enum_map = serializer.enum_map
+    for excel_filepath, sheet_scans in book_scans:
+        for sheet_name, header, column_list in sheet_scans:
+            plan.sheet_list.append((excel_filepath, sheet_name))
+            plan.header_map[(excel_filepath, sheet_name)] = header
+            for column in column_list:
+                field = EnumFieldObject(column.enum)
+                field.default = column.default
+                if column.enum not in enum_map: enum_map[column.enum] = {}
+                field.case_map = enum_map.get(column.enum)
+                field.hook_default()
+                field.import_cases(column.case_list, options.auto_default_case)
+    if save_enums: serializer.save_enums()
+    plan.enum_map = enum_map
+    if options.first_sheet: plan.sheet_list = plan.sheet_list[:1]
+    return plan
+
+def create_targets(options): # type: (object)->list[object]
+    """options of each output variant, variants of --targets are written into workspace/<format>_<access>"""
+    if not options.targets: return [options]
+    import copy
+    target_list = []
+    for name in options.targets: # type: str
+        format_name, _, access = name.partition(':')
+        target = copy.copy(options)
+        target.use_protobuf = format_name == 'pb'
+        target.access = access if access else FieldAccess.default.name
+        target.workspace = p.join(options.workspace, '{}_{}'.format('protobuf' if target.use_protobuf else 'flatbuffers', target.access))
+        target_list.append(target)
+    if sum(1 for x in target_list if x.use_protobuf) > 1:
+        # protoc modules of the same schema can't be loaded twice into the default descriptor pool of a process
+        for target in target_list: target.no_protoc = target.no_protoc or target.use_protobuf
+    return target_list
+
+def get_target_name(options)->str:
+    return '{}:{}'.format('pb' if options.use_protobuf else 'fb', options.access)
+
+def build_schemas(plan:BuildPlan, target_list, record_map = None): # type: (BuildPlan, list[object], dict[tuple[str, str], list[dict]])->tuple[dict[tuple[str, str], list[SheetResult]], list[list[str]]]
+    """write schemas of all sheets for each target from header rows, and return schema files of each target for compiling,
+    headers of sheets whose header fingerprints match their manifest records are not parsed again"""
+    import contextlib, traceback
+    result_map:dict[tuple[str, str], list[SheetResult]] = {}
+    schema_lists = [[] for _ in target_list] # type: list[list[str]]
+    enum_version = get_enum_version(plan.enum_map)
+    for excel_filepath, sheet_name in plan.sheet_list:
+        result_list = result_map[(excel_filepath, sheet_name)] = []
+        serializer = None # header is parsed once for all targets
+        header = plan.header_map.get((excel_filepath, sheet_name))
+        header_digest = get_header_digest(header) if record_map is not None else None
+        for n in range(len(target_list)):
+            target = target_list[n]
+            result = SheetResult(excel_filepath, sheet_name)
+            result.target = get_target_name(target)
+            result_list.append(result)
+            if header_digest:
+                result.header_fingerprint = get_sheet_fingerprint(header_digest, target, enum_version, datemode=0)
+                record = record_map.get((excel_filepath, sheet_name))[n]
+                schema_files = get_schema_files(p.join(target.workspace, get_sheet_artifacts(sheet_name, target)[0])) \
+                    if record and record.get('header') == result.header_fingerprint else None
+                if schema_files: # schema is unchanged, and compiled again only if its module is out of date
+                    for filepath in schema_files:
+                        if filepath not in schema_lists[n]: schema_lists[n].append(filepath)
+                    continue
+            buffer = io.StringIO()
+            with contextlib.redirect_stdout(buffer):
+                try:
+                    if not serializer:
+                        parser = create_serializer(target, enum_map=plan.enum_map)
+                        parser.enum_frozen = True
+                        parser.parse_syntax(header)
+                        serializer = parser
+                    encoder = create_encoder(target, datemode=0)
+                    serializer.pack_syntax(encoder)
+                    for filepath in encoder.schema_list:
+                        if filepath not in schema_lists[n]: schema_lists[n].append(filepath)
+                except Exception:
+                    result.error = traceback.format_exc()
+            result.log = buffer.getvalue()
+    return result_map, schema_lists
+
+def write_schemas(options, verbose:bool = True)->int:
+    """write schemas of all sheets from header rows without encoding them, returns count of failed sheets,
+    with --header-only data rows are not read, and enum cases are those saved by last build"""
+    target_list = create_targets(options)
+    for target in target_list:
+        if not p.exists(target.workspace): os.makedirs(target.workspace)
+    if options.header_only: book_scans = [(x, scan_book(x, header_only=True)) for x in get_book_list(options)]
+    else: book_scans = scan_books(options)
+    failure_count = 0
+    report_map = {} # type: dict[str, bool]
+    # --diff is read-only, it never saves enum registry
+    for plan, group_targets in plan_targets(target_list, book_scans, save_enums=not options.header_only and not options.diff):
+        for name, case_map in plan.enum_map.items():
+            if case_map or report_map.get(name): continue
+            report_map[name] = True # cases of new enum types are only collected from data rows
+            print('[*] enum {} has no cases, written with {} only'.format(name, BookEncoder.get_enum_cases(name, case_map)[0][0]), file=sys.stderr)
+        result_map, _ = build_schemas(plan, group_targets)
+        last_filepath:str = None
+        for excel_filepath, sheet_name in plan.sheet_list:
+            if excel_filepath != last_filepath:
+                last_filepath = excel_filepath
+                if verbose: print('>>> {}'.format(excel_filepath))
+            for result in result_map.get((excel_filepath, sheet_name)):
+                if verbose: print(result.log, end='')
+                if not result.error: continue
+                failure_count += 1
+                print('[-] {} {!r} failed'.format(sheet_name, excel_filepath), file=sys.stderr)
+                if options.error or options.debug: print(result.error, file=sys.stderr)
+    return failure_count
+
+def compile_targets(target_list, schema_lists): # type: (list[object], list[list[str]])->None
+    """compile changed schemas with a single compiler call per target"""
+    for target, schema_list in zip(target_list, schema_lists):
+        if schema_list: create_encoder(target, datemode=0).compile_schemas(schema_list)
+
+def build_sheet(excel_filepath:str, sheet_name:str, target_list, enum_map, record_list, capture:bool = True, writer = None): # type: (str, str, list[object], dict[str, dict[str, int]], list[dict], bool, PipelineStage)->list[SheetResult]
+    """parse sheet once and encode it for every target"""
+    import contextlib, traceback, time
+    result_list:list[SheetResult] = []
+    serializer:SheetSerializer = None
+    sheet_digest:str = None
+    book:xlrd.book.Book = None
+    for target, record in zip(target_list, record_list):
+        result = SheetResult(excel_filepath, sheet_name)
+        result.target = get_target_name(target)
+        result_list.append(result)
+        cache = ArtifactCache(target.artifact_cache) if target.artifact_cache else None
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer) if capture else contextlib.nullcontext():
+            try:
+                book = open_book(excel_filepath)
+                sheet = book.sheet_by_name(sheet_name)
+                if not sheet_digest: sheet_digest = get_sheet_digest(sheet)
+                result.fingerprint = get_sheet_fingerprint(sheet_digest, target, get_enum_version(enum_map), book.datemode)
+                if record and record.get('fingerprint') == result.fingerprint \
+                        and all(p.exists(x) for x in record.get('artifacts')):
+                    result.artifacts = record.get('artifacts')
+                    result.size = record.get('size') or p.getsize(result.artifacts[-1])
+                    result.row_count = record.get('rows', 0)
+                    result.skipped = True
+                    print('[=] {} unchanged\n'.format(sheet_name))
+                elif cache and cache.load('sheets', result.fingerprint, target.workspace):
+                    result.artifacts = [p.join(target.workspace, x) for x in get_sheet_artifacts(sheet_name, target)]
+                    result.size = p.getsize(result.artifacts[-1])
+                    result.row_count = cache.load_info('sheets', result.fingerprint).get('rows', 0)
+                    result.restored = True
+                    print('[~] {} restored from artifact cache\n'.format(sheet_name))
+                else:
+                    if not serializer:
+                        start = time.perf_counter()
+                        parser = create_serializer(target, enum_map=enum_map)
+                        parser.enum_frozen = True
+                        parser.debug = False # syntax has been logged while building schemas
+                        parser.parse_syntax(sheet)
+                        serializer = parser
+                        result.parse_time = time.perf_counter() - start
+                    start = time.perf_counter()
+                    encoder = create_encoder(target, datemode=book.datemode)
+                    encoder.output_writer = writer
+                    result.output_futures = encoder.output_futures
+                    serializer.pack(encoder, auto_default_case=target.auto_default_case, save_syntax=False)
+                    result.encode_time = time.perf_counter() - start
+                    if encoder.output_filepath:
+                        result.artifacts = [p.join(target.workspace, x) for x in get_sheet_artifacts(sheet_name, target)]
+                        result.size = encoder.output_size
+                        result.row_count = encoder.row_count
+                        if cache:
+                            for future in encoder.output_futures: future.result() # binary is written by writer stage
+                            cache.save('sheets', result.fingerprint, result.artifacts, target.workspace, info={'rows': result.row_count})
+            except Exception:
+                result.error = traceback.format_exc()
+        result.log = buffer.getvalue()
+    if book: unload_sheet(book, sheet_name) # sheets are built once, so rows are dropped as soon as they are encoded
+    return result_list
+
+def plan_targets(target_list, book_scans, save_enums:bool = True): # type: (list[object], list, bool)->list[tuple[BuildPlan, list[object]]]
+    """targets are grouped by their enum maps, which only differ in enum optimizing settings of formats"""
+    group_map = {} # type: dict[str, tuple[BuildPlan, list[object]]]
+    for target in target_list:
+        plan = plan_build(target, book_scans=book_scans, save_enums=save_enums)
+        group_map.setdefault(get_enum_version(plan.enum_map), (plan, []))[1].append(target)
+    return list(group_map.values())
+
+def build_books(options, session = None)->int: # type: (object, BuildSession)->int
+    target_list = create_targets(options)
+    for target in target_list:
+        if not p.exists(target.workspace): os.makedirs(target.workspace)
+    jobs = max(1, options.jobs if options.jobs > 0 else os.cpu_count())
+    executor = session.executor if session else None
+    if not executor and jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        if session: session.executor = executor # keep workers warm
+    book_scans = scan_books(options, executor, session)
+    failure_count = 0
+    for plan, group_targets in plan_targets(target_list, book_scans):
+        failure_count += build_targets(plan, group_targets, executor, session)
+        if failure_count and options.error and not executor: break
+    if executor and not session: executor.shutdown()
+    return failure_count
+
+class BookWatcher(object):
+    """poll file stats of books, a changed book is reported after it stays unchanged for debounce seconds"""
+    def __init__(self, book_list:list[str], debounce:float):
+        self.debounce = debounce
+        self.stat_map = {x: get_book_stat(x) for x in book_list} # type: dict[str, tuple[int, int]]
+        self.change_map = {} # type: dict[str, tuple[tuple[int, int], float]]
+
+    def poll(self)->list[str]:
+        import time
+        now = time.monotonic()
+        book_list = []
+        for excel_filepath, last_stat in self.stat_map.items():
+            stat = get_book_stat(excel_filepath)
+            change = self.change_map.get(excel_filepath)
+            if stat == last_stat or not stat: # missing while being saved
+                if stat: self.change_map.pop(excel_filepath, None)
+                continue
+            if not change or change[0] != stat:
+                self.change_map[excel_filepath] = stat, now
+            elif now - change[1] >= self.debounce:
+                del self.change_map[excel_filepath]
+                self.stat_map[excel_filepath] = stat
+                book_list.append(excel_filepath)
+        return book_list
+
+def watch_books(options):
+    """build books, then keep generated modules and scanned headers in process and rebuild books on saving"""
+    import time, traceback
+    options.no_protoc = True # protoc modules of a changed schema can't be loaded into default descriptor pool again
+    session = BuildSession()
+    book_list = get_book_list(options)
+    watcher = BookWatcher(book_list, options.debounce)
+    build_books(options, session)
+    print('[*] watching {} books, press Ctrl+C to stop'.format(len(book_list)))
+    try:
+        while True:
+            time.sleep(options.watch_interval)
+            change_list = watcher.poll()
+            if not change_list: continue
+            for excel_filepath in change_list: print('[*] {!r} changed'.format(excel_filepath))
+            start = time.perf_counter()
+            session.book_filter = set(change_list)
+            try:
+                failure_count = build_books(options, session)
+            except Exception: # book may be broken while being saved, it is built again on next saving
+                failure_count = 1
+                traceback.print_exc()
+            print('[*] rebuilt in {:.2f}s{}'.format(time.perf_counter() - start, ' with {} failures'.format(failure_count) if failure_count else ''))
+    except KeyboardInterrupt: pass
+    finally:
+        if session.executor: session.executor.shutdown()
+
+def load_records(sheet_list, target_list, manifest_list): # type: (list[tuple[str, str]], list[object], list[BuildManifest])->dict[tuple[str, str], list[dict]]
+    record_map:dict[tuple[str, str], list[dict]] = {}
+    for excel_filepath, sheet_name in sheet_list:
+        record_map[(excel_filepath, sheet_name)] = [None if x.rebuild else m.get(m.get_key(sheet_name, x)) for x, m in zip(target_list, manifest_list)]
+    return record_map
+
+def build_targets(plan:BuildPlan, target_list, executor = None, session = None)->int: # type: (BuildPlan, list[object], object, BuildSession)->int
+    import collections, traceback
+    options = target_list[0]
+    if session:
+        key = '|'.join(x.workspace for x in target_list)
+        enum_version = get_enum_version(plan.enum_map)
+        if session.book_filter is not None and session.enum_versions.get(key) == enum_version:
+            import copy
+            plan = copy.copy(plan) # sheets of other books are up to date
+            plan.sheet_list = [x for x in plan.sheet_list if x[0] in session.book_filter]
+        session.enum_versions[key] = enum_version
+    sheet_list, enum_map = plan.sheet_list, plan.enum_map
+    manifest_list = [BuildManifest(x.workspace) for x in target_list]
+    record_map = load_records(sheet_list, target_list, manifest_list)
+    schema_map, schema_lists = build_schemas(plan, target_list, record_map)
+    compile_targets(target_list, schema_lists)
+    # serial builds run as a pipeline: books are loaded ahead on a reader process while sheets are parsed and encoded,
+    # and outputs are written and verified on a writer thread, queue depth caps books and outputs held in memory
+    depth = 0 if executor else options.queue_depth if options.queue_depth is not None else 2 if os.cpu_count() > 1 else 0
+    book_list = [x for n, (x, _) in enumerate(sheet_list) if (n == 0 or sheet_list[n - 1][0] != x) and is_book_preloadable(x)] # in order of use
+    reader = BookReader(book_list, depth) if depth > 0 and book_list else None
+    writer = PipelineStage(depth) if depth > 0 else None
+    def get_build_indice(excel_filepath, sheet_name): # targets whose schemas have been built
+        return [n for n, x in enumerate(schema_map.get((excel_filepath, sheet_name))) if not x.error]
+    def submit_sheet(excel_filepath, sheet_name, capture = True):
+        indice = get_build_indice(excel_filepath, sheet_name)
+        if not indice: return None
+        records = record_map.get((excel_filepath, sheet_name))
+        arguments = (excel_filepath, sheet_name, [target_list[x] for x in indice], enum_map, [records[x] for x in indice])
+        return executor.submit(build_sheet, *arguments) if capture else build_sheet(*arguments, capture=False, writer=writer)
+    def report_sheet(excel_filepath, sheet_name, result_list)->int: # type: (str, str, list[SheetResult])->int
+        count = 0
+        for target, manifest, result in zip(target_list, manifest_list, result_list):
+            for future in result.output_futures:
+                try:
+                    future.result()
+                except Exception:
+                    if not result.error: result.error = traceback.format_exc()
+            key = manifest.get_key(sheet_name, target)
+            if result.error:
+                manifest.remove(key)
+                count += 1
+                print('[-] {} {!r} failed'.format(sheet_name, excel_filepath), file=sys.stderr)
+                if options.error or options.debug: print(result.error, file=sys.stderr)
+            else: manifest.update(key, result.fingerprint, result.artifacts, result.size, result.row_count, result.header_fingerprint)
+        return count
+    future_list = [submit_sheet(*x) for x in sheet_list] if executor else [None for _ in sheet_list]
+    # report results in book order no matter when they were finished
+    failure_count = 0
+    last_filepath:str = None
+    pending = collections.deque() # sheets with outputs in writer stage
+    for n in range(len(sheet_list)):
+        excel_filepath, sheet_name = sheet_list[n]
+        if excel_filepath != last_filepath:
+            last_filepath = excel_filepath
+            print('>>> {}'.format(excel_filepath))
+            if reader and is_book_preloadable(excel_filepath): open_book(*reader.next())
+        result_list = schema_map.get((excel_filepath, sheet_name))[:]
+        for result in result_list: print(result.log, end='')
+        indice = get_build_indice(excel_filepath, sheet_name)
+        if not indice: build_results = []
+        elif not executor:
+            build_results = submit_sheet(excel_filepath, sheet_name, capture=False)
+        else:
+            try:
+                build_results = future_list[n].result()
+            except Exception as error: # worker process crashed
+                build_results = [SheetResult(excel_filepath, sheet_name) for _ in indice]
+                for result in build_results: result.error = '{}: {}\n'.format(error.__class__.__name__, error)
+            for result in build_results: print(result.log, end='')
+        for index, result in zip(indice, build_results):
+            result.header_fingerprint = result_list[index].header_fingerprint
+            result_list[index] = result
+        pending.append((excel_filepath, sheet_name, result_list))
+        while pending and (len(pending) > depth or all(x.done() for r in pending[0][2] for x in r.output_futures)):
+            failure_count += report_sheet(*pending.popleft())
+        if failure_count and options.error and not executor: break
+    while pending: failure_count += report_sheet(*pending.popleft())
+    if reader: reader.close()
+    if writer: writer.close()
+    for manifest in manifest_list: manifest.save()
+    return failure_count
+
+# settings which only control how a build runs, shards take all other settings from job manifest
+RUNTIME_SETTINGS = ('excel_file', 'workspace', 'jobs', 'rebuild', 'debug', 'error', 'queue_depth', 'watch', 'watch_interval', 'debounce',
+                    'artifact_cache', 'sheet_cache', 'no_mmap', 'header_only', 'diff', 'serve', 'plan_shards', 'run_shard', 'merge_shards', 'shard', 'shard_dirs')
+
+def get_sheet_cost(header:SheetHeader)->int:
+    return max(1, header.row_count - ROW_DATA_INDEX) * max(1, header.ncols)
+
+def assign_shards(sheet_jobs, shard_count:int)->list[int]: # type: (list[dict], int)->list[int]
+    """give every sheet to the least loaded shard from the most costly one, which only depends on job manifest"""
+    shard_loads = [0] * shard_count
+    shard_list = [0] * len(sheet_jobs)
+    for n in sorted(range(len(sheet_jobs)), key=lambda x: (-sheet_jobs[x]['cost'], x)):
+        shard = min(range(shard_count), key=lambda x: (shard_loads[x], x))
+        shard_loads[shard] += sheet_jobs[n]['cost']
+        shard_list[n] = shard
+    return shard_list
+
+def parse_shard(shard:str)->tuple[int, int]:
+    """parse 1-based shard number like 2/4"""
+    match = re.match(r'^(\d+)/(\d+)$', shard or '')
+    if not match or not 0 < int(match.group(1)) <= int(match.group(2)):
+        raise ValueError('shard should be like i/N with 1 <= i <= N, but got {!r}'.format(shard))
+    return int(match.group(1)), int(match.group(2))
+
+def load_job(job_filepath:str, options)->dict:
+    with open(job_filepath, 'rb') as fp: data = fp.read()
+    job = json.loads(data)
+    if job.get('version') != VERSION: raise ValueError('job manifest {!r} was planned by version {}'.format(job_filepath, job.get('version')))
+    job['digest'] = hashlib.md5(data).hexdigest()
+    for name, value in job.get('settings').items(): setattr(options, name, value)
+    options.excel_file = [x.get('book') for x in job.get('sheets')]
+    return job
+
+def plan_shards(options):
+    """scan books and freeze enum maps into a job manifest, which is shared by all shards of a distributed build"""
+    target_list = create_targets(options)
+    book_scans = scan_books(options)
+    plan_list, sheet_list = [], []
+    for plan, group_targets in plan_targets(target_list, book_scans):
+        plan_list.append({'targets': [get_target_name(x) for x in group_targets], 'enum_map': plan.enum_map})
+        sheet_list = plan.sheet_list
+    header_map = {(x, name): header for x, scans in book_scans for name, header, _ in scans}
+    job = {'version': VERSION,
+           'settings': {k: v for k, v in sorted(vars(options).items()) if k not in RUNTIME_SETTINGS},
+           'plans': plan_list,
+           'sheets': [{'book': x, 'sheet': name, 'cost': get_sheet_cost(header_map.get((x, name)))} for x, name in sheet_list]}
+    temp_filepath = '{}.{}.tmp'.format(options.plan_shards, os.getpid())
+    with open(temp_filepath, 'w') as fp: json.dump(job, fp, indent=4, ensure_ascii=False)
+    os.replace(temp_filepath, options.plan_shards)
+    print('[+] {} sheets planned into {!r}'.format(len(job['sheets']), options.plan_shards))
+
+def run_shard(options)->int:
+    """build sheets of one shard into workspace with frozen enum maps of job manifest"""
+    shard, shard_count = parse_shard(options.shard)
+    job = load_job(options.run_shard, options)
+    sheet_jobs = job.get('sheets')
+    sheet_list = [(x['book'], x['sheet']) for x, n in zip(sheet_jobs, assign_shards(sheet_jobs, shard_count)) if n == shard - 1]
+    target_list = create_targets(options)
+    for target in target_list:
+        if not p.exists(target.workspace): os.makedirs(target.workspace)
+    jobs = max(1, options.jobs if options.jobs > 0 else os.cpu_count())
+    executor = None
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    header_map = {x: read_header(open_book(x[0]).sheet_by_name(x[1])) for x in sheet_list}
+    failure_count = 0
+    for job_plan in job.get('plans'):
+        plan = BuildPlan()
+        plan.sheet_list, plan.header_map, plan.enum_map = sheet_list, header_map, job_plan.get('enum_map')
+        failure_count += build_targets(plan, [x for x in target_list if get_target_name(x) in job_plan.get('targets')], executor)
+    if executor: executor.shutdown()
+    with open(p.join(options.workspace, SHARD_NAME), 'w') as fp:
+        json.dump({'version': VERSION, 'job': job.get('digest'), 'shard': [shard, shard_count], 'failures': failure_count}, fp, indent=4)
+    return failure_count
+
+def merge_shards(options)->int:
+    """collect outputs of all shards into workspace, shards must come from the same job and agree on shared schemas"""
+    job = load_job(options.merge_shards, options)
+    shard_map = {} # type: dict[int, str]
+    shard_count = None
+    for shard_dir in options.shard_dirs or []:
+        with open(p.join(shard_dir, SHARD_NAME)) as fp: info = json.load(fp)
+        if info.get('job') != job.get('digest'): raise ValueError('{!r} was built from another job manifest'.format(shard_dir))
+        shard, count = info.get('shard')
+        if shard_count not in (None, count): raise ValueError('{!r} is shard {}/{}, but others are of {}'.format(shard_dir, shard, count, shard_count))
+        if shard in shard_map: raise ValueError('shard {}/{} is given twice: {!r} {!r}'.format(shard, count, shard_map[shard], shard_dir))
+        shard_count = count
+        shard_map[shard] = shard_dir
+    missing = [x for x in range(1, (shard_count or 0) + 1) if x not in shard_map]
+    if not shard_map or missing: raise ValueError('shards {} are missing'.format(missing or 'all'))
+    sheet_jobs = job.get('sheets')
+    shard_list = assign_shards(sheet_jobs, shard_count)
+    failure_count = 0
+    for target in create_targets(options):
+        target_dir = p.relpath(target.workspace, options.workspace)
+        if not p.exists(target.workspace): os.makedirs(target.workspace)
+        manifest = BuildManifest(target.workspace)
+        shared_map = {} # type: dict[str, tuple[str, bytes]]
+        for shard in sorted(shard_map):
+            shard_workspace = p.normpath(p.join(shard_map[shard], target_dir))
+            for filepath in sorted(glob.glob(p.join(shard_workspace, '{}*'.format(SHARED_PREFIX)))):
+                if p.isdir(filepath): continue
+                with open(filepath, 'rb') as fp: data = fp.read()
+                name = p.basename(filepath)
+                if name in shared_map and shared_map[name][1] != data:
+                    raise ValueError('{!r} of shard {} differs from {!r}'.format(filepath, shard, shared_map[name][0]))
+                shared_map[name] = filepath, data
+            shard_manifest = BuildManifest(shard_workspace)
+            for sheet_job, n in zip(sheet_jobs, shard_list):
+                if n != shard - 1: continue
+                key = manifest.get_key(sheet_job['sheet'], target)
+                record = shard_manifest.get(key)
+                # artifact paths are recorded where shard was built, which may be another machine
+                source_list = [p.join(shard_workspace, p.basename(x)) for x in record.get('artifacts')] if record else []
+                if not source_list or not all(p.exists(x) for x in source_list):
+                    failure_count += 1
+                    manifest.remove(key)
+                    print('[-] {} of shard {} {!r} is not built'.format(sheet_job['sheet'], shard, shard_map[shard]), file=sys.stderr)
+                    continue
+                artifacts = []
+                for filepath in source_list:
+                    artifacts.append(p.join(target.workspace, p.basename(filepath)))
+                    copy_file(filepath, artifacts[-1])
+                manifest.update(key, record.get('fingerprint'), artifacts, record.get('size', 0), record.get('rows', 0), record.get('header'))
+        for name in sorted(shared_map):
+            copy_file(shared_map[name][0], p.join(target.workspace, name))
+        manifest.save()
+        print('[+] merged {} shards into {!r}'.format(len(shard_map), target.workspace))
+    return failure_count
+
+async def compile_target_async(target, schema_list)->str: # type: (object, list[str])->str
+    """run schema compiler as a subprocess of event loop, and return error message if it failed"""
+    import asyncio
+    encoder = create_encoder(target, datemode=0)
+    python_out, compile_list, save_index = encoder.check_schemas(schema_list)
+    if not compile_list: return None
+    command = encoder.get_compiler_command(python_out, compile_list)
+    try:
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+    except OSError as error:
+        return '{}: {}\n'.format(error.__class__.__name__, error)
+    output, _ = await process.communicate()
+    if process.returncode != 0:
+        return '{!r} exited with code {}\n{}'.format(command[0], process.returncode, output.decode('utf-8', errors='replace'))
+    save_index()
+    return None
+
+async def build_targets_async(plan:BuildPlan, target_list, executor): # type: (BuildPlan, list[object], object)->list[SheetResult]
+    import asyncio
+    loop = asyncio.get_running_loop()
+    sheet_list, enum_map = plan.sheet_list, plan.enum_map
+    manifest_list = [BuildManifest(x.workspace) for x in target_list]
+    record_map = load_records(sheet_list, target_list, manifest_list)
+    schema_map, schema_lists = await loop.run_in_executor(executor, build_schemas, plan, target_list, record_map)
+    compile_errors = await asyncio.gather(*[compile_target_async(x, y) for x, y in zip(target_list, schema_lists)])
+    for result_list in schema_map.values():
+        for result, error in zip(result_list, compile_errors):
+            if error and not result.error: result.error = error
+    async def build_sheet_async(excel_filepath, sheet_name): # type: (str, str)->list[SheetResult]
+        result_list = schema_map.get((excel_filepath, sheet_name))[:]
+        indice = [n for n, x in enumerate(result_list) if not x.error]
+        if not indice: return result_list
+        records = record_map.get((excel_filepath, sheet_name))
+        try:
+            build_results = await loop.run_in_executor(executor, build_sheet, excel_filepath, sheet_name,
+                                                       [target_list[x] for x in indice], enum_map, [records[x] for x in indice])
+        except Exception as error: # worker process crashed
+            build_results = [SheetResult(excel_filepath, sheet_name) for _ in indice]
+            for index, result in zip(indice, build_results):
+                result.target = get_target_name(target_list[index])
+                result.error = '{}: {}\n'.format(error.__class__.__name__, error)
+        for index, result in zip(indice, build_results):
+            result.log = result_list[index].log + result.log
+            result.header_fingerprint = result_list[index].header_fingerprint
+            result_list[index] = result
+        return result_list
+    sheet_results = await asyncio.gather(*[build_sheet_async(*x) for x in sheet_list])
+    for (_, sheet_name), result_list in zip(sheet_list, sheet_results):
+        for target, manifest, result in zip(target_list, manifest_list, result_list):
+            key = manifest.get_key(sheet_name, target)
+            if result.error: manifest.remove(key)
+            else: manifest.update(key, result.fingerprint, result.artifacts, result.size, result.row_count, result.header_fingerprint)
+    for manifest in manifest_list: manifest.save()
+    return [x for result_list in sheet_results for x in result_list]
+
+async def build(excel_files, workspace:str, **settings): # type: (list[str], str, ...)->list[SheetResult]
+    """build books from an asyncio event loop and return results of every sheet and target in book order,
+    settings are named after command line options, e.g. await build(files, workspace, use_protobuf=True, jobs=4)"""
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    options = create_argument_parser().parse_args(['--excel-file', *excel_files, '--workspace', workspace])
+    for name, value in settings.items():
+        if not hasattr(options, name): raise TypeError('unknown build setting {!r}'.format(name))
+        setattr(options, name, value)
+    target_list = create_targets(options)
+    for target in target_list:
+        if not p.exists(target.workspace): os.makedirs(target.workspace)
+    loop = asyncio.get_running_loop()
+    result_list:list[SheetResult] = []
+    # parsing and encoding always run in worker processes, which keeps event loop responsive and stdout untouched
+    with ProcessPoolExecutor(max_workers=max(1, options.jobs if options.jobs > 0 else os.cpu_count())) as executor:
+        book_list = get_book_list(options)
+        scan_list = await asyncio.gather(*[loop.run_in_executor(executor, scan_book, x) for x in book_list])
+        # planning imports enum cases and writes enum registry, which runs in a thread as plans stay in this process
+        plan_list = await loop.run_in_executor(None, plan_targets, target_list, list(zip(book_list, scan_list)))
+        for plan, group_targets in plan_list:
+            result_list.extend(await build_targets_async(plan, group_targets, executor))
+    return result_list
+
+def create_argument_parser(): # type: ()->object
     import argparse
-    arguments = argparse.ArgumentParser()
+    arguments = argparse.ArgumentParser(usage='%(prog)s [{build,schema}] [options] | {verify,dump,size} [options]',
+                                        epilog='build is the default command, schema writes schemas without encoding sheets, '
+                                               'verify/dump/size take options of unittest.py/dump.py/size_report.py')
     arguments.add_argument('--workspace', '-w', default=p.expanduser('~/Downloads/flatcfg'), help='workspace path for outputs and temp files')
-    arguments.add_argument('--excel-file', '-f', nargs='+', required=True, help='xls book file path')
+    arguments.add_argument('--excel-file', '-f', nargs='+', help='xls book file path')
     arguments.add_argument('--use-protobuf', '-u', action='store_true', help='generate protobuf format binary output')
+    arguments.add_argument('--no-protoc', '-np', action='store_true', help='build protobuf message classes in process instead of running protoc')
+    arguments.add_argument('--wire-format', '-wf', action='store_true', help='write protobuf rows in wire format directly instead of building message objects, protoc is not needed')
+    arguments.add_argument('--stream', '-s', action='store_true', help='encode and write protobuf rows one by one to keep memory bounded, implied by --wire-format')
+    arguments.add_argument('--row-jobs', '-rj', default=1, type=int, help='number of processes for encoding row chunks of a protobuf sheet, 0 for cpu count')
+    arguments.add_argument('--chunk-rows', '-cr', default=10000, type=int, help='number of rows in each chunk of --row-jobs and --stream')
+    arguments.add_argument('--row-cache', '-rc', action='store_true', help='reuse encoded protobuf messages of unchanged rows from last build')
+    arguments.add_argument('--no-flatc', '-nf', action='store_true', help='encode flatbuffers with vtable slots computed in process instead of flatc generated modules')
     arguments.add_argument('--debug', '-d', action='store_true', help='use debug mode to get more detial information')
     arguments.add_argument('--error', '-e', action='store_true', help='raise error to console')
     arguments.add_argument('--auto-default-case', '-c', action='store_true', help='auto generate a NONE default case for each enum')
@@ -1419,6 +3799,25 @@ if __name__ == '__main__':
     arguments.add_argument('--access', '-a', choices=FieldAccess.get_option_choices(), default='default')
     arguments.add_argument('--first-sheet', '-fs', action='store_true', help='only serialize first sheet')
     arguments.add_argument('--force-null', '-null', action='store_true', help='encode empty string/vector to null')
+    arguments.add_argument('--rebuild', '-r', action='store_true', help='rebuild all sheets even if they are unchanged since last build')
+    arguments.add_argument('--targets', '-t', nargs='+', choices=['{}:{}'.format(f, a) for f in ('fb', 'pb') for a in FieldAccess.get_option_choices()], metavar='FORMAT:ACCESS',
+                           help='build several format:access variants in one pass, each into workspace/<format>_<access>, -u and -a are ignored')
+    arguments.add_argument('--watch', '-wt', action='store_true', help='keep running and rebuild books when they are saved')
+    arguments.add_argument('--watch-interval', '-wi', default=0.5, type=float, help='seconds between polling books in --watch mode')
+    arguments.add_argument('--debounce', '-db', default=1.0, type=float, help='seconds a saved book must stay unchanged before it is rebuilt in --watch mode')
+    arguments.add_argument('--serve', '-sv', nargs='?', const=get_daemon_socket(), help='run as build daemon on a unix socket only current user can connect, requests are sent by flatcfg_client.py')
+    arguments.add_argument('--plan-shards', '-ps', metavar='JOB_FILE', help='write job manifest of sheets with cost estimates and frozen enum maps for distributed builds')
+    arguments.add_argument('--run-shard', '-rs', metavar='JOB_FILE', help='build sheets of --shard from job manifest into workspace')
+    arguments.add_argument('--shard', '-sh', metavar='I/N', help='1-based shard number and shard count for --run-shard')
+    arguments.add_argument('--merge-shards', '-ms', metavar='JOB_FILE', help='merge workspaces of --shard-dirs built from job manifest into workspace')
+    arguments.add_argument('--shard-dirs', '-sd', nargs='+', help='shard workspaces for --merge-shards')
+    arguments.add_argument('--artifact-cache', '-ac', metavar='DIR', help='shared directory of schemas, binaries and compiled modules keyed by content, restored instead of building')
+    arguments.add_argument('--sheet-cache', '-sc', metavar='DIR', help='directory of binary sheet caches, which are read instead of decoding unchanged books')
+    arguments.add_argument('--no-mmap', '-nm', action='store_true', help='read book files into memory instead of mapping them, sheets are loaded on demand either way')
+    arguments.add_argument('--header-only', '-ho', action='store_true', help='schema command only reads header rows of sheets, enum cases are those saved by last build')
+    arguments.add_argument('--diff', '-df', action='store_true', help='schema command prints differences from schemas in workspace instead of writing them, and exits with 1 if any changed')
+    arguments.add_argument('--jobs', '-j', default=1, type=int, help='number of processes for building sheets, 0 for cpu count')
+    arguments.add_argument('--queue-depth', '-qd', type=int, help='books loaded ahead and outputs waiting for writing in serial builds, 0 to run without pipeline, defaults to 2 with several cpus')
     # arguments for fixed float encoding
     arguments.add_argument('--fixed32-fraction-bits', '-b32', default=10, type=int, help='use 2^exponent to present fractional part of a float32 value')
     arguments.add_argument('--fixed64-fraction-bits', '-b64', default=20, type=int, help='use 2^exponent to present fractional part of a float64 value')
@@ -1428,41 +3827,197 @@ if __name__ == '__main__':
     # arguments for fixing enum default values
     arguments.add_argument('--enum-unique', '-eu', action='store_true', help='ensure unique case name, only for FlatBuffers')
     arguments.add_argument('--enum-prefix', '-ep', action='store_true', help='auto prepend with a pattern string, only for FlatBuffers')
-    options = arguments.parse_args(sys.argv[1:])
-    for excel_filepath in options.excel_file:
-        if p.basename(excel_filepath).startswith('~$'): continue
-        print('>>> {}'.format(excel_filepath))
-        book = xlrd.open_workbook(excel_filepath)
-        for sheet_name in book.sheet_names(): # type: str
-            if not sheet_name.isupper(): continue
-            serializer = SheetSerializer(debug=options.debug)
-            if options.use_protobuf:
-                serializer.optimize_enum_map(auto_prepend_prefix=True, unique_case_name=True)
-            else:
-                serializer.optimize_enum_map(auto_prepend_prefix=options.enum_prefix, unique_case_name=options.enum_unique)
-            serializer.compatible_mode = options.compatible_mode
-            serializer.signed_encoding = not options.unsigned_encoding
-            if options.fixed32:
-                serializer.fixed32_codec = FixedCodec(fraction_bits=options.fixed32_fraction_bits, type_size=32)
-            if options.fixed64:
-                serializer.fixed64_codec = FixedCodec(fraction_bits=options.fixed64_fraction_bits, type_size=64)
-            try:
-                serializer.parse_syntax(book.sheet_by_name(sheet_name))
-                if options.use_protobuf:
-                    encoder = ProtobufEncoder(workspace=options.workspace, debug=options.debug)
-                else:
-                    encoder = FlatbufEncoder(workspace=options.workspace, debug=options.debug)
-                encoder.access = FieldAccess.get_value(options.access)
-                encoder.force_null = options.force_null
-                encoder.datemode = book.datemode
-                encoder.set_package_name(options.namespace)
-                encoder.set_timezone(options.time_zone)
-                serializer.pack(encoder, auto_default_case=options.auto_default_case)
-            except Exception as error:
-                if options.error: raise error
-                else: continue
-            if options.first_sheet: exit()
-        book.release_resources()
-
-
+    return arguments
+
+def parse_options(args): # type: (list[str])->object
+    arguments = create_argument_parser()
+    options = arguments.parse_args(args)
+    set_book_mmap(not options.no_mmap)
+    set_sheet_cache(options.sheet_cache)
+    if not options.excel_file and not (options.serve or options.run_shard or options.merge_shards):
+        arguments.error('the following arguments are required: --excel-file/-f')
+    return options
+
+class MessageWriter(io.TextIOBase):
+    """text stream sending written text to build client as json lines"""
+    def __init__(self, connection, name:str):
+        super(MessageWriter, self).__init__()
+        self.connection = connection
+        self.name = name
+
+    def write(self, text:str)->int:
+        if text: send_message(self.connection, {self.name: text})
+        return len(text)
+
+def get_daemon_socket()->str:
+    """default socket of build daemon, in runtime directory of current user"""
+    import tempfile
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime_dir: runtime_dir = p.join(tempfile.gettempdir(), 'flatcfg-{}'.format(os.getuid()))
+    return p.join(runtime_dir, DAEMON_SOCKET_NAME)
+
+def check_daemon_socket(socket_path:str)->str:
+    """returns why socket path can't be served, a stale socket of current user is removed"""
+    import socket, stat
+    directory = p.dirname(p.abspath(socket_path))
+    if not p.exists(directory): os.makedirs(directory, mode=0o700)
+    if not p.lexists(socket_path): return None
+    status = os.lstat(socket_path)
+    if status.st_uid != os.getuid() or not stat.S_ISSOCK(status.st_mode):
+        return '{!r} is not a socket of current user'.format(socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with client:
+        try:
+            client.connect(socket_path)
+            return 'another daemon is serving on {!r}'.format(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError): pass
+    os.remove(socket_path)
+    return None
+
+def send_message(connection, message:dict):
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+def serve_request(request:dict, connection, session_map)->int: # type: (dict, object, dict[int, BuildSession])->int
+    import contextlib
+    cwd = os.getcwd()
+    with contextlib.redirect_stdout(MessageWriter(connection, 'out')), contextlib.redirect_stderr(MessageWriter(connection, 'err')):
+        try:
+            os.chdir(request.get('cwd', cwd))
+            command, args = split_command(request.get('args', []))
+            if command != 'build':
+                print('[-] {!r} command is not supported by daemon, only build'.format(command), file=sys.stderr)
+                return 2
+            options = parse_options(args)
+            if options.serve or options.watch:
+                print('[-] --serve and --watch are not supported by daemon', file=sys.stderr)
+                return 2
+            options.no_protoc = True # protoc modules of the same schema can't be loaded into default descriptor pool twice
+            session = session_map.setdefault(options.jobs, BuildSession())
+            return 1 if build_books(options, session) > 0 and options.error else 0
+        except SystemExit as error: # argument errors
+            return error.code if isinstance(error.code, int) else 2
+        finally:
+            os.chdir(cwd)
+
+def serve_builds(socket_path:str)->int:
+    """build daemon on a unix socket, imports, generated modules, books and header scans stay in process between requests,
+    requests run as current user, so the socket is only accessible to current user"""
+    import socket, traceback
+    error = check_daemon_socket(socket_path)
+    if error:
+        print('[-] {}'.format(error), file=sys.stderr)
+        return 2
+    set_book_cache_limit(0)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177) # socket is created with 0600
+    try: server.bind(socket_path)
+    finally: os.umask(umask)
+    os.chmod(socket_path, 0o600)
+    server.listen(16)
+    print('[*] serving builds on {!r}, press Ctrl+C to stop'.format(socket_path))
+    session_map = {} # type: dict[int, BuildSession]
+    try:
+        running = True
+        while running:
+            connection, _ = server.accept()
+            with connection: # requests are served one by one, as builds share process state
+                try:
+                    with connection.makefile('rb') as fp: line = fp.readline()
+                    if not line: continue # probed by check_daemon_socket
+                    request = json.loads(line)
+                    if request.get('command') == 'stop':
+                        running = False
+                        exit_code = 0
+                    else: exit_code = serve_request(request, connection, session_map)
+                    send_message(connection, {'exit': exit_code})
+                except (BrokenPipeError, ConnectionResetError): pass # client has gone
+                except Exception:
+                    traceback.print_exc()
+                    try:
+                        send_message(connection, {'err': traceback.format_exc()})
+                        send_message(connection, {'exit': 2})
+                    except OSError: pass
+    except KeyboardInterrupt: pass
+    finally:
+        server.close()
+        if p.exists(socket_path): os.remove(socket_path)
+        for session in session_map.values():
+            if session.executor: session.executor.shutdown()
+    return 0
+
+def run_build(args)->int: # type: (list[str])->int
+    options = parse_options(args)
+    if options.serve: return serve_builds(options.serve)
+    elif options.plan_shards: plan_shards(options)
+    elif options.run_shard:
+        if run_shard(options) > 0 and options.error: return 1
+    elif options.merge_shards:
+        if merge_shards(options) > 0: return 1
+    elif options.watch: watch_books(options)
+    elif build_books(options) > 0 and options.error: return 1
+    return 0
+
+def diff_schemas(options)->int:
+    """write schemas into a temp workspace and print their differences from schemas in workspace, returns count of changed schemas"""
+    import copy, difflib, shutil, tempfile
+    temp_options = copy.copy(options)
+    temp_options.workspace = tempfile.mkdtemp(prefix='flatcfg_schema_')
+    change_count = 0
+    try:
+        if write_schemas(temp_options, verbose=False) > 0 and options.error: return -1
+        for directory, _, filename_list in os.walk(temp_options.workspace):
+            for filename in sorted(filename_list):
+                temp_filepath = p.join(directory, filename)
+                filepath = p.join(options.workspace, p.relpath(temp_filepath, temp_options.workspace))
+                with open(temp_filepath) as fp: line_list = fp.readlines()
+                last_line_list = []
+                if p.exists(filepath):
+                    with open(filepath) as fp: last_line_list = fp.readlines()
+                if line_list == last_line_list: continue
+                change_count += 1
+                sys.stdout.writelines(difflib.unified_diff(last_line_list, line_list, fromfile=filepath, tofile=filepath))
+    finally:
+        shutil.rmtree(temp_options.workspace, ignore_errors=True)
+    print('[{}] {} schemas changed'.format('*' if change_count else '=', change_count))
+    return change_count
+
+def run_schema(args)->int: # type: (list[str])->int
+    options = parse_options(args)
+    if options.diff: return 1 if diff_schemas(options) != 0 else 0
+    return 1 if write_schemas(options) > 0 and options.error else 0
+
+def load_script(name:str)->object:
+    """load a sibling script as module, scripts importing flatcfg share this module instead of importing it again"""
+    import importlib.util
+    sys.modules.setdefault('flatcfg', sys.modules[__name__])
+    spec = importlib.util.spec_from_file_location('flatcfg_{}'.format(name), p.join(p.dirname(p.abspath(__file__)), '{}.py'.format(name)))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_verify(args)->int: # type: (list[str])->int
+    module = load_script('unittest')
+    module.verify(module.create_argument_parser().parse_args(args))
+    return 0
+
+def run_dump(args)->int: # type: (list[str])->int
+    module = load_script('dump')
+    module.dump_config(module.create_argument_parser().parse_args(args))
+    return 0
+
+def run_size(args)->int: # type: (list[str])->int
+    module = load_script('size_report')
+    module.report_sizes(module.create_argument_parser().parse_args(args))
+    return 0
+
+# each command only imports what it needs, e.g. dump and size never load xlrd
+COMMAND_MAP = {'build': run_build, 'verify': run_verify, 'dump': run_dump, 'size': run_size, 'schema': run_schema}
+
+def split_command(args): # type: (list[str])->tuple[str, list[str]]
+    """command name is optional, plain options run a build as before"""
+    if args and args[0] in COMMAND_MAP: return args[0], args[1:]
+    return 'build', args
 
+if __name__ == '__main__':
+    command, command_args = split_command(sys.argv[1:])
+    sys.exit(COMMAND_MAP[command](command_args))
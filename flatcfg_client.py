@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import socket, json, sys, os
+
+DAEMON_SOCKET_NAME = 'flatcfg.sock'
+
+def get_daemon_socket()->str:
+    """default socket of build daemon, same as `flatcfg.py --serve`"""
+    import tempfile
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime_dir: runtime_dir = os.path.join(tempfile.gettempdir(), 'flatcfg-{}'.format(os.getuid()))
+    return os.path.join(runtime_dir, DAEMON_SOCKET_NAME)
+
+def request_daemon(socket_path:str, request:dict)->int:
+    """send request to daemon started by `flatcfg.py --serve`, stream its output and return exit code of build"""
+    if os.stat(socket_path).st_uid != os.getuid():
+        print('[-] {!r} is not a socket of current user'.format(socket_path), file=sys.stderr)
+        return 2
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    with client:
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('rb') as fp:
+            for line in fp:
+                message = json.loads(line)
+                if 'out' in message:
+                    sys.stdout.write(message['out'])
+                    sys.stdout.flush()
+                elif 'err' in message:
+                    sys.stderr.write(message['err'])
+                    sys.stderr.flush()
+                elif 'exit' in message: return message['exit']
+    print('[-] daemon closed connection', file=sys.stderr)
+    return 2
+
+if __name__ == '__main__':
+    import argparse
+    arguments = argparse.ArgumentParser(allow_abbrev=False, description='build with a running `flatcfg.py --serve` daemon, other arguments are passed to flatcfg.py')
+    arguments.add_argument('--socket', '-S', default=get_daemon_socket(), help='unix socket path of build daemon')
+    arguments.add_argument('--stop', action='store_true', help='stop build daemon')
+    options, build_arguments = arguments.parse_known_args(sys.argv[1:])
+    if options.stop: request = {'command': 'stop'}
+    else: request = {'command': 'build', 'cwd': os.getcwd(), 'args': build_arguments}
+    try:
+        sys.exit(request_daemon(options.socket, request))
+    except (FileNotFoundError, ConnectionRefusedError):
+        print('[-] no build daemon on {!r}, start it with `flatcfg.py --serve`'.format(options.socket), file=sys.stderr)
+        sys.exit(2)
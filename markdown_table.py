@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
-import xlrd, sys, io, re, argparse
+import sys, io, re, argparse
+from flatcfg import open_workbook, set_sheet_cache
 
 if __name__ == '__main__':
     arguments = argparse.ArgumentParser()
@@ -8,14 +9,16 @@ if __name__ == '__main__':
     arguments.add_argument('--print-full', '-a', action='store_true')
     arguments.add_argument('--show-row-info', '-i', action='store_true')
     arguments.add_argument('--fraction-num', '-n', type=int, default=3)
+    arguments.add_argument('--sheet-cache', '-sc')
     options = arguments.parse_args(sys.argv[1:])
+    set_sheet_cache(options.sheet_cache)
     buffer = io.StringIO()
     show_row_info = options.show_row_info
     note_column = ('FIELD_RULE', 'FIELD_TYPE', 'FIELD_NAME', 'FIELD_ACES', 'FIELD_DESC')
     float_format_ge = '{{:.{}f}}'.format(options.fraction_num)
     float_format_lt = '{{:.{}f}}'.format(options.fraction_num*2)
     for book_filepath in options.excel_file:
-        book = xlrd.open_workbook(book_filepath)
+        book = open_workbook(book_filepath)
         buffer.write('> {}\n'.format(book_filepath))
         for sheet_name in book.sheet_names(): # type: str
             if not sheet_name.isupper(): continue
@@ -53,6 +56,7 @@ if __name__ == '__main__':
                     buffer.write(' {} |'.format(value))
                 buffer.write('\n')
             buffer.write('\n'*2)
+            book.unload_sheet(sheet_name)
         book.release_resources()
     buffer.seek(0)
     print(buffer.read())
\ No newline at end of file
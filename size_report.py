@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
+import sys, os, re
 
-if __name__ == '__main__':
-    import argparse, sys, os, re
+def create_argument_parser(): # type: ()->object
+    import argparse
     arguments = argparse.ArgumentParser()
     arguments.add_argument('--workspace', '-w', default=os.path.expanduser('~/Downloads/flatcfg'))
     arguments.add_argument('--markdown', '-m', action='store_true')
-    options = arguments.parse_args(sys.argv[1:])
+    return arguments
+
+def report_sizes(options):
     workspace = options.workspace # type: str
     markdown = options.markdown # type: bool
     result = []
@@ -48,5 +51,5 @@ if __name__ == '__main__':
         percent = diff / stat[1] * 100
         print(report_format.format(*stat, diff, percent))
 
-
-
+if __name__ == '__main__':
+    report_sizes(create_argument_parser().parse_args(sys.argv[1:]))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 from flatcfg import *
 import os.path as p
-import xlrd
+import xlrd, glob
 
 class Suitcase(Codec):
     def __init__(self):
@@ -16,6 +16,7 @@ class Suitcase(Codec):
         self.fixed32_codec: FixedCodec = None
         self.fixed64_codec: FixedCodec = None
         self.signed_encoding: bool = True
+        self.encoder: BookEncoder = None
 
     def build_layout(self):
         self.row_layout = []
@@ -45,10 +46,14 @@ class Suitcase(Codec):
         assert flag, 'expect={!r} but={!r}'.format(value, store)
 
     def compile_schemas(self) -> str:
-        pass
+        extension = p.splitext(self.encoder.enum_filename)[1]
+        schema_list = glob.glob('{}/{}*{}'.format(self.workspace, SHARED_PREFIX, extension))
+        schema_list.append(p.join(self.workspace, '{}{}'.format(self.sheet.name.lower(), extension)))
+        return self.encoder.compile_schemas(schema_list)
 
     def load_modules(self):
-        BookEncoder.load_modules(self)
+        self.compile_schemas()
+        self.module_map = self.encoder.load_modules()
         return self.module_map
 
     def run(self):
@@ -59,9 +64,6 @@ class ProtobufSuitcase(Suitcase):
         super(ProtobufSuitcase, self).__init__()
         self.data:object = None
 
-    def compile_schemas(self)->str:
-        return ProtobufEncoder.compile_schemas(self)
-
     def create_root_object(self, buffer)->object:
         module_name = self.sheet.name # type: str
         module = self.module_map.get('{}_pb2'.format(module_name.lower()))
@@ -143,9 +145,6 @@ class FlatbufSuitcase(Suitcase):
         super(FlatbufSuitcase, self).__init__()
         self.data:object = None
 
-    def compile_schemas(self):
-        return FlatbufEncoder.compile_schemas(self)
-
     def read_data(self):
         data_filepath = '{}/{}.fpb'.format(self.workspace, self.sheet.name.lower())
         with open(data_filepath, 'rb') as fp:
@@ -229,24 +228,132 @@ class FlatbufSuitcase(Suitcase):
             self.cursor = n
             self.test_table(self.table, getattr(self.data, 'Items')(n))
 
-if __name__ == '__main__':
-    import argparse, sys
+def create_argument_parser(): # type: ()->object
+    import argparse
     arguments = argparse.ArgumentParser()
-    arguments.add_argument('--excel-file', '-f', nargs='+', required=True)
+    arguments.add_argument('--excel-file', '-f', nargs='*', default=[])
     arguments.add_argument('--protobuf', '-pb', action='store_true')
     arguments.add_argument('--first-sheet', '-fs', action='store_true', help='only serialize first sheet')
+    arguments.add_argument('--access-targets', '-at', action='store_true', help='check outputs of --targets with client/server variants against builds of each access mode')
+    arguments.add_argument('--header-schemas', '-hs', action='store_true', help='check that schemas of enums without cases compile, and --header-only or --diff schemas of books leave enum registry unchanged')
+    arguments.add_argument('--imports', '-im', action='store_true', help='check that flatcfg imports no excel or serialization libraries and stays within import time budget')
+    arguments.add_argument('--import-budget', '-ib', default=50, type=float, metavar='MS', help='cumulative import time budget of flatcfg in milliseconds')
     arguments.add_argument('--namespace', '-n', default='dataconfig', help='namespace for serialize class')
     arguments.add_argument('--workspace', '-w', default=p.expanduser('~/Downloads/flatcfg'), help='workspace path for outputs and temp files')
     arguments.add_argument('--debug', '-d', action='store_true', help='use debug mode to get more detial information')
+    arguments.add_argument('--sheet-cache', '-sc', metavar='DIR', help='directory of binary sheet caches shared with flatcfg.py builds')
     # arguments for fixed float encoding
     arguments.add_argument('--fixed32-fraction-bits', '-b32', default=10, type=int, help='use 2^exponent to present fractional part of a float32 value')
     arguments.add_argument('--fixed64-fraction-bits', '-b64', default=20, type=int, help='use 2^exponent to present fractional part of a float64 value')
     arguments.add_argument('--fixed64', '-64', action='store_true', help='encode double field values into FixedFloat64 type')
     arguments.add_argument('--fixed32', '-32', action='store_true', help='encode float field values into FixedFloat32 type')
     arguments.add_argument('--unsigned-encoding', '-0', action='store_true', help='encode fixed memory value into unsign integer type')
-    options = arguments.parse_args(sys.argv[1:])
+    return arguments
+
+def run_flatcfg(*args): # type: (str)->tuple[int, str]
+    """run flatcfg.py in a new process, as protobuf modules of the same schema can't be loaded twice into a process"""
+    import subprocess, sys
+    command = [sys.executable, p.join(p.dirname(p.abspath(__file__)), 'flatcfg.py'), *args]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    return process.returncode, process.stdout
+
+def verify_targets(options):
+    """outputs of each client/server variant of --targets must be the same as a build with that format and access mode"""
+    import filecmp
+    workspace = p.join(options.workspace, 'targets')
+    target_list = ['{}:{}'.format(f, a) for f in ('fb', 'pb') for a in ('client', 'server')]
+    build_args = ['--excel-file', *options.excel_file, '--namespace', options.namespace, '--rebuild', '--error']
+    exit_code, output = run_flatcfg(*build_args, '--workspace', workspace, '--targets', *target_list)
+    assert exit_code == 0 and '[-]' not in output, output
+    for target in target_list:
+        format_name, _, access = target.partition(':')
+        dirname = '{}_{}'.format('protobuf' if format_name == 'pb' else 'flatbuffers', access)
+        access_workspace = p.join(options.workspace, 'access', dirname)
+        exit_code, output = run_flatcfg(*build_args, '--workspace', access_workspace, '--access', access, *(['--use-protobuf'] if format_name == 'pb' else []))
+        assert exit_code == 0 and '[-]' not in output, output
+        filename_list = sorted(p.basename(x) for pattern in ('*.fbs', '*.fpb', '*.proto', '*.ppb') for x in glob.glob(p.join(access_workspace, pattern)))
+        assert filename_list, 'no outputs of {!r}'.format(target)
+        for filename in filename_list:
+            filepath = p.join(workspace, dirname, filename)
+            assert filecmp.cmp(filepath, p.join(access_workspace, filename), shallow=False), \
+                '{!r} is different from --access {} build'.format(filepath, access)
+        print('[+] {} same as --access {} build, {} files'.format(target, access, len(filename_list)))
+
+def verify_header_schemas(options):
+    """enums without cases, e.g. new types seen by --header-only, must still give schemas that compilers accept,
+    and --header-only schemas of --excel-file books must be written without failures"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as workspace:
+        for encoder in (FlatbufEncoder(workspace, debug=False), ProtobufEncoder(workspace, debug=False)):
+            encoder.set_package_name(options.namespace)
+            encoder.save_enums(enum_map={'VerifyEmptyType': {}, 'VerifyEmptyKind': {}})
+            encoder.compile_schemas()
+            print('[+] {} of enums without cases compiled'.format(encoder.enum_filename))
+    if not options.excel_file: return
+    enum_filepath = p.join(p.dirname(p.abspath(__file__)), '{}.json'.format(SHARED_ENUM_NAME))
+    def read_enums()->bytes:
+        if not p.exists(enum_filepath): return None
+        with open(enum_filepath, 'rb') as fp: return fp.read()
+    enum_data = read_enums()
+    for format_args in ([], ['--use-protobuf']):
+        schema_args = ['schema', '--excel-file', *options.excel_file, '--namespace', options.namespace,
+                       '--workspace', p.join(options.workspace, 'header_only'), '--error', *format_args]
+        exit_code, output = run_flatcfg(*schema_args, '--header-only')
+        assert exit_code == 0 and '[-]' not in output, output
+        print('[+] --header-only {}schemas written'.format('protobuf ' if format_args else 'flatbuffers '))
+        exit_code, output = run_flatcfg(*schema_args, '--diff') # exits with 1 if any schema changed
+        assert exit_code in (0, 1) and 'schemas changed' in output, output
+        print('[+] --diff {}schemas compared'.format('protobuf ' if format_args else 'flatbuffers '))
+    assert read_enums() == enum_data, '{!r} changed by --header-only or --diff'.format(enum_filepath)
+    print('[+] {} unchanged'.format(enum_filepath))
+
+HEAVY_MODULES = ('xlrd', 'flatbuffers', 'google.protobuf')
+
+def get_import_times(pycache:str, *args): # type: (str, str)->dict[str, int]
+    """run python with -X importtime in a new process, returns cumulative microseconds of each imported module"""
+    import subprocess, sys, os
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache) # bytecode is cached, so source compiling isn't timed after first run
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    process = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=p.dirname(p.abspath(__file__)), env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert process.returncode == 0, '{}\n{}'.format(process.stdout, process.stderr)
+    time_map = {} # type: dict[str, int]
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'): continue
+        columns = line[len('import time:'):].split('|')
+        if not columns[1].strip().isdigit(): continue # header line
+        time_map[columns[2].strip()] = int(columns[1])
+    return time_map
+
+def verify_imports(options):
+    """importing flatcfg or running the size command loads no excel or serialization libraries,
+    and cumulative import time of flatcfg stays within --import-budget"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as workspace:
+        for filename in ('sample.fpb', 'sample.ppb'):
+            with open(p.join(workspace, filename), 'wb') as fp: fp.write(b'\x00' * 16)
+        pycache = p.join(workspace, 'pycache')
+        get_import_times(pycache, '-c', 'import flatcfg') # warm up bytecode cache
+        for name, args in (('import flatcfg', ['-c', 'import flatcfg']), ('flatcfg.py size', ['flatcfg.py', 'size', '--workspace', workspace])):
+            time_map = get_import_times(pycache, *args)
+            loaded = [x for x in time_map if any(x == m or x.startswith(m + '.') for m in HEAVY_MODULES)]
+            assert not loaded, '{} loads {}'.format(name, ', '.join(loaded))
+            print('[+] {} loads none of {}'.format(name, ', '.join(HEAVY_MODULES)))
+        cost = min(get_import_times(pycache, '-c', 'import flatcfg').get('flatcfg') for _ in range(3)) / 1000
+    assert cost <= options.import_budget, 'import flatcfg takes {:.1f}ms, budget {}ms'.format(cost, options.import_budget)
+    print('[+] import flatcfg {:.1f}ms within {}ms budget'.format(cost, options.import_budget))
+
+def verify(options):
+    """run checks picked by options, then verify outputs of --excel-file books"""
+    if options.imports: verify_imports(options)
+    if options.header_schemas: verify_header_schemas(options)
+    if options.access_targets: verify_targets(options)
+    if options.excel_file: verify_books(options)
+
+def verify_books(options):
+    set_sheet_cache(options.sheet_cache)
     for excel_filepath in options.excel_file:
-        book = xlrd.open_workbook(excel_filepath)
+        book = open_workbook(excel_filepath)
         for sheet_name in book.sheet_names(): # type: str
             if not sheet_name.isupper(): continue
             sheet = book.sheet_by_name(sheet_name)
@@ -260,11 +367,12 @@ if __name__ == '__main__':
             if not serializer.root_table.member_fields: continue
             if options.protobuf:
                 suitcase = ProtobufSuitcase()
-                suitcase.python_out = p.join(options.workspace, 'pp')
+                suitcase.encoder = ProtobufEncoder(workspace=options.workspace, debug=options.debug)
             else:
                 suitcase = FlatbufSuitcase()
-                suitcase.python_out = p.join(options.workspace, 'fp', options.namespace)
-            sys.path.append(suitcase.python_out)
+                suitcase.encoder = FlatbufEncoder(workspace=options.workspace, debug=options.debug)
+            suitcase.encoder.set_package_name(options.namespace)
+            suitcase.python_out = suitcase.encoder.get_module_path()
             suitcase.signed_encoding = serializer.signed_encoding
             suitcase.fixed64_codec = serializer.fixed64_codec
             suitcase.fixed32_codec = serializer.fixed32_codec
@@ -274,6 +382,11 @@ if __name__ == '__main__':
             suitcase.load_modules()
             suitcase.build_layout()
             suitcase.run()
-            if options.first_sheet: exit()
-
+            book.unload_sheet(sheet_name)
+            if options.first_sheet: break
+        book.release_resources()
+        if options.first_sheet: return
 
+if __name__ == '__main__':
+    import sys
+    verify(create_argument_parser().parse_args(sys.argv[1:]))